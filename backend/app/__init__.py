@@ -8,17 +8,51 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     
+    # Client address from trusted reverse proxies (per-IP rate limits)
+    if app.config['TRUSTED_PROXY_COUNT']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        count = app.config['TRUSTED_PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=count, x_proto=count)
+    
     # CORS
     CORS(app)
     
     # JWT
     jwt = JWTManager(app)
     
+    # Role checks from token claims, with cached revocation checks
+    from app.services.access_control import access_control
+    access_control.init_app(app, jwt)
+    
     # Database
     from app.models import db
     db.init_app(app)
     migrate = Migrate(app, db)
     
+    # Face engine selection (FACE_ENGINE)
+    from app.services.face_engines import face_engines
+    face_engines.init_app(app)
+    
+    # Face gallery cache
+    from app.services.gallery_cache import gallery_cache
+    gallery_cache.init_app(app)
+    
+    # Face encoding process pool
+    from app.services.encoding_executor import encoding_executor
+    encoding_executor.init_app(app)
+    
+    # Background batch registration jobs
+    from app.services.registration_jobs import registration_jobs
+    registration_jobs.init_app(app)
+    
+    # Staged encodings of enrollments in progress
+    from app.services.enrollment_staging import enrollment_staging
+    enrollment_staging.init_app(app)
+    
+    # Shared rate limits
+    from app.services.rate_limiter import rate_limiter
+    rate_limiter.init_app(app)
+    
     # Blueprints
     from app.routes.auth import auth_bp
     from app.routes.attendance import attendance_bp
@@ -30,8 +64,36 @@ def create_app():
     app.register_blueprint(face_bp, url_prefix='/api/face')
     app.register_blueprint(users_bp, url_prefix='/api/users')
     
+    # CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+    
     # Create tables
     with app.app_context():
         db.create_all()
     
-    return app
\ No newline at end of file
+    # Write-behind attendance buffer (replays rows left by a previous run)
+    from app.services.attendance_buffer import attendance_buffer
+    attendance_buffer.init_app(app)
+    
+    # Load models and gallery before serving the first request
+    if app.config['FACE_WARMUP']:
+        _warm_up(app)
+    
+    return app
+
+def _warm_up(app):
+    """Load the configured engine's models and the gallery and run one dummy inference."""
+    from app.services.face_engines import face_engines
+    from app.services.gallery_cache import gallery_cache
+    
+    try:
+        with app.app_context():
+            face_engine = face_engines.get()
+            # For FACE_ENGINE=dlib this loads the landmark predictor and the ResNet
+            face_engine.warm_up()
+            count = gallery_cache.ensure_loaded(face_engine)
+        print(f"Warm-up complete: {count} face encodings loaded")
+    except Exception as e:
+        # Serving still works; the first request will load lazily instead
+        print(f"Warm-up failed: {str(e)}")
\ No newline at end of file
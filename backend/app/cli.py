@@ -0,0 +1,120 @@
+import json
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+attendance_cli = AppGroup('attendance', help='Attendance maintenance commands.')
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+@attendance_cli.command('rebuild-summaries')
+@click.option('--start-date', help='First day to rebuild (YYYY-MM-DD), default: all history')
+@click.option('--end-date', help='Last day to rebuild (YYYY-MM-DD), default: all history')
+def rebuild_summaries(start_date, end_date):
+    """Recompute the daily attendance summary tables from attendance_logs."""
+    from app.services.attendance_summary import rebuild
+
+    count = rebuild(_parse_date(start_date), _parse_date(end_date))
+    click.echo(f"Rebuilt daily attendance summaries: {count} user-day rows")
+
+
+def _plan_queries():
+    """The hot lookups whose plans must stay on an index, by name."""
+    from datetime import date, time
+    from sqlalchemy import select, tuple_
+    from app.models.attendance import AttendanceLog
+    from app.models.attendance_summary import DailyUserAttendance
+    from app.models.user import User
+
+    today = date.today()
+    user_id = '00000000-0000-0000-0000-000000000000'
+    newest_first = (AttendanceLog.date.desc(), AttendanceLog.time.desc(), AttendanceLog.id.desc())
+    return {
+        'check-in lookup (user_id, date)': select(AttendanceLog.id).where(
+            AttendanceLog.user_id == user_id, AttendanceLog.date == today),
+        "today's logs (date)": select(AttendanceLog).where(AttendanceLog.date == today),
+        'history first page': select(AttendanceLog).order_by(*newest_first).limit(100),
+        'history next page': select(AttendanceLog).where(
+            tuple_(AttendanceLog.date, AttendanceLog.time, AttendanceLog.id) < (today, time(8), user_id)
+        ).order_by(*newest_first).limit(100),
+        # Same filter and columns as gallery_cache.ensure_loaded()
+        'gallery load': select(User).where(User.face_encodings.isnot(None), User.is_active == True),
+        'user stats window': select(DailyUserAttendance.status).where(
+            DailyUserAttendance.user_id == user_id, DailyUserAttendance.date >= today),
+    }
+
+
+def _full_scans(conn, statement):
+    """Explain a statement; returns (plan text, tables read by a full scan)."""
+    compiled = statement.compile(dialect=conn.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    if conn.dialect.name == 'sqlite':
+        # sqlite3 only binds dates/times as the ISO strings SQLAlchemy stores
+        params = tuple(value.isoformat() if hasattr(value, 'isoformat') else value for value in params)
+    return _sql_full_scans(conn, str(compiled), params)
+
+
+def _sql_full_scans(conn, sql, params):
+    """Explain SQL text with driver-level parameters, e.g. as captured from
+    a cursor execute; returns (plan text, tables read by a full scan)."""
+    dialect = conn.dialect.name
+
+    if dialect == 'sqlite':
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params).all()
+        details = [row[-1] for row in rows]
+        # "SCAN t" without "USING ... INDEX" reads every row of t
+        scans = [detail.split()[1] for detail in details
+                 if detail.startswith('SCAN ') and 'INDEX' not in detail]
+        return '\n'.join(details), scans
+
+    if dialect == 'postgresql':
+        # Tiny tables are seq-scanned anyway; ask whether an index path exists
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+        nodes, scans = [plan[0]['Plan']], []
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan':
+                scans.append(node['Relation Name'])
+            nodes.extend(node.get('Plans', []))
+        return json.dumps(plan, indent=2), scans
+
+    raise click.ClickException(f"Query plan checks are not implemented for {dialect}")
+
+
+@click.command('check-query-plans')
+@click.option('--verbose', is_flag=True, help='Print every plan, not only failures')
+def check_query_plans(verbose):
+    """Fail if a hot attendance or gallery query plans a full table scan.
+
+    Run against a migrated database (SQLite or PostgreSQL), e.g. in CI after
+    `flask db upgrade`.
+    """
+    from app.models import db
+
+    failures = 0
+    with db.engine.connect() as conn:
+        for name, statement in _plan_queries().items():
+            with conn.begin() as transaction:
+                plan, scans = _full_scans(conn, statement)
+                transaction.rollback()
+            if scans:
+                failures += 1
+                click.echo(f"FAIL {name}: full scan of {', '.join(scans)}\n{plan}\n")
+            else:
+                click.echo(f"ok   {name}")
+                if verbose:
+                    click.echo(f"{plan}\n")
+    if failures:
+        raise click.ClickException(f"{failures} queries fall back to full scans")
+
+
+def register_commands(app):
+    app.cli.add_command(attendance_cli)
+    app.cli.add_command(check_query_plans)
@@ -3,4 +3,6 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 from app.models.user import User
-from app.models.attendance import AttendanceLog
\ No newline at end of file
+from app.models.attendance import AttendanceLog
+from app.models.attendance_summary import DailyUserAttendance, DailyRoleAttendance
+from app.models.enrollment_staging import EnrollmentStagingEncoding
@@ -1,10 +1,17 @@
 from app.models import db
+from app.models.user import User
 from datetime import datetime
 import uuid
 
 class AttendanceLog(db.Model):
     __tablename__ = 'attendance_logs'
-    __table_args__ = {'extend_existing': True}  # Allow table redefinition
+    __table_args__ = (
+        # One log per user and day; writes go through insert-or-ignore
+        db.Index('uq_attendance_logs_user_date', 'user_id', 'date', unique=True),
+        # /today, /history (keyset order) and the export
+        db.Index('ix_attendance_logs_date_time_id', 'date', 'time', 'id'),
+        {'extend_existing': True}  # Allow table redefinition
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
@@ -25,4 +32,34 @@ class AttendanceLog(db.Model):
             'status': self.status,
             'confidence': self.confidence,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def serialized_query():
+        """Query of just the columns row_to_dict needs, with the user's name
+        joined in, so serializing many logs costs one query instead of one
+        user load (face image included) per row"""
+        return db.session.query(
+            AttendanceLog.id,
+            AttendanceLog.user_id,
+            User.name.label('user_name'),
+            AttendanceLog.date,
+            AttendanceLog.time,
+            AttendanceLog.status,
+            AttendanceLog.confidence,
+            AttendanceLog.created_at
+        ).outerjoin(User, User.id == AttendanceLog.user_id)
+    
+    @staticmethod
+    def row_to_dict(row):
+        """Same shape as to_dict, built from a serialized_query() row"""
+        return {
+            'id': row.id,
+            'user_id': row.user_id,
+            'user_name': row.user_name,
+            'date': row.date.isoformat(),
+            'time': row.time.isoformat(),
+            'status': row.status,
+            'confidence': row.confidence,
+            'created_at': row.created_at.isoformat()
+        }
@@ -0,0 +1,43 @@
+from app.models import db
+
+
+class DailyUserAttendance(db.Model):
+    """One row per user and day with attendance, kept in sync with attendance_logs"""
+    __tablename__ = 'daily_user_attendance'
+    __table_args__ = (
+        # Per-user windows (/stats per_user and user_id)
+        db.Index('ix_daily_user_attendance_user_date', 'user_id', 'date'),
+    )
+    
+    date = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    role = db.Column(db.String(20), nullable=False)  # role at check-in time
+    status = db.Column(db.String(20), nullable=False)
+    
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat(),
+            'user_id': self.user_id,
+            'role': self.role,
+            'status': self.status
+        }
+
+
+class DailyRoleAttendance(db.Model):
+    """Per-day attendance counts for each role, kept in sync with attendance_logs"""
+    __tablename__ = 'daily_role_attendance'
+    
+    date = db.Column(db.Date, primary_key=True)
+    role = db.Column(db.String(20), primary_key=True)
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    late_count = db.Column(db.Integer, nullable=False, default=0)
+    absent_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat(),
+            'role': self.role,
+            'present': self.present_count,
+            'late': self.late_count,
+            'absent': self.absent_count
+        }
@@ -0,0 +1,19 @@
+from app.models import db
+from datetime import datetime
+
+
+class EnrollmentStagingEncoding(db.Model):
+    """A face encoding collected by /api/face/register that is waiting for the
+    rest of the user's enrollment images (see services/enrollment_staging.py)"""
+    __tablename__ = 'enrollment_staging_encodings'
+    __table_args__ = (
+        # Per-user count and take, oldest first
+        db.Index('ix_enrollment_staging_user_created', 'user_id', 'created_at'),
+        # Expiry sweep
+        db.Index('ix_enrollment_staging_created', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    encoding = db.Column(db.LargeBinary, nullable=False)  # one float32 encoding, see encoding_codec
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -4,14 +4,26 @@ import uuid
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Partial index for the face gallery load (active users with enrolled faces)
+        db.Index(
+            'ix_users_active_enrolled', 'id',
+            postgresql_where=db.text('face_encodings IS NOT NULL AND is_active = true'),
+            sqlite_where=db.text('face_encodings IS NOT NULL AND is_active = 1')
+        ),
+        # Roster queries filter on role and active state
+        db.Index('ix_users_role_active', 'role', 'is_active'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # student, teacher, admin
-    face_image = db.Column(db.LargeBinary)  # Store raw face image data for backup
-    face_encodings = db.Column(db.Text)  # JSON encoded face encodings (multiple per user)
+    # Heavy columns are deferred; undefer them only where they are used
+    face_image = db.deferred(db.Column(db.LargeBinary))  # Store raw face image data for backup
+    face_encodings = db.deferred(db.Column(db.LargeBinary))  # Packed float32 face encodings (see services/encoding_codec.py)
+    has_face_image = db.column_property(face_image.expression.isnot(None))
     face_registered_at = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -29,6 +41,6 @@ class User(db.Model):
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'face_registered_at': self.face_registered_at.isoformat() if self.face_registered_at else None,
-            'has_face_image': bool(self.face_image),
+            'has_face_image': bool(self.has_face_image),
             'is_face_registered': bool(self.face_registered_at)
         }
\ No newline at end of file
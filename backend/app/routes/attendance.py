@@ -1,10 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required
 from app.models import db
 from app.models.attendance import AttendanceLog
 from app.models.user import User
-from datetime import datetime, date, timedelta
-from sqlalchemy import and_
+from app.models.attendance_summary import DailyUserAttendance, DailyRoleAttendance
+from app.services.attendance_recorder import attendance_recorder
+from app.services.attendance_buffer import attendance_buffer
+from app.services.access_control import roles_required
+from datetime import datetime, date, timedelta, time as dt_time
+from sqlalchemy import and_, func, tuple_
+import base64
+import binascii
+import csv
+import io
+import json
+import zlib
 
 attendance_bp = Blueprint('attendance', __name__)
 
@@ -24,31 +34,20 @@ def log_attendance():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Check if already logged today
-        today = date.today()
-        existing_log = AttendanceLog.query.filter_by(
-            user_id=user_id, date=today
-        ).first()
+        # Insert-or-ignore against the unique (user_id, date) index
+        now = datetime.now()
+        attendance_id, inserted = attendance_recorder.record(
+            {user.id: (status, data.get('confidence'))}, day=now.date(), now=now, buffered=False
+        )[user.id]
         
-        if existing_log:
+        if not inserted:
             return jsonify({'error': 'Attendance already logged for today'}), 400
         
-        # Create attendance log
-        now = datetime.now()
-        attendance = AttendanceLog(
-            user_id=user_id,
-            date=today,
-            time=now.time(),
-            status=status,
-            confidence=data.get('confidence')
-        )
-        
-        db.session.add(attendance)
-        db.session.commit()
+        attendance = AttendanceLog.serialized_query().filter(AttendanceLog.id == attendance_id).one()
         
         return jsonify({
             'message': 'Attendance logged successfully',
-            'attendance': attendance.to_dict()
+            'attendance': AttendanceLog.row_to_dict(attendance)
         }), 201
         
     except Exception as e:
@@ -57,15 +56,23 @@ def log_attendance():
 @attendance_bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_attendance_history():
+    """Attendance history, newest first, keyset-paginated on (date, time, id)
+    
+    Query params: user_id, start_date, end_date, limit, cursor (the
+    next_cursor of the previous page) and stream=true to stream the whole
+    range as JSON from a server-side cursor instead of returning one page.
+    """
     try:
         user_id = request.args.get('user_id')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        cursor = request.args.get('cursor')
         
-        query = AttendanceLog.query
+        # Plain rows with the user's name joined in, not ORM objects
+        query = AttendanceLog.serialized_query()
         
         if user_id:
-            query = query.filter_by(user_id=user_id)
+            query = query.filter(AttendanceLog.user_id == user_id)
         
         if start_date:
             start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
@@ -75,27 +82,170 @@ def get_attendance_history():
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
             query = query.filter(AttendanceLog.date <= end_date)
         
-        # Order by date descending
-        attendance_logs = query.order_by(AttendanceLog.date.desc()).all()
+        if cursor:
+            try:
+                after = _decode_cursor(cursor)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.filter(
+                tuple_(AttendanceLog.date, AttendanceLog.time, AttendanceLog.id) < after
+            )
+        
+        # Order by date descending (time and id make the order total for the cursor)
+        query = query.order_by(
+            AttendanceLog.date.desc(), AttendanceLog.time.desc(), AttendanceLog.id.desc()
+        )
+        
+        if request.args.get('stream', 'false').lower() == 'true':
+            return Response(
+                stream_with_context(_stream_history(query)),
+                mimetype='application/json'
+            )
+        
+        max_limit = current_app.config['HISTORY_MAX_PAGE_SIZE']
+        try:
+            limit = int(request.args.get('limit', current_app.config['HISTORY_PAGE_SIZE']))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, max_limit))
+        
+        # One extra row tells whether there is a next page
+        attendance_logs = query.limit(limit + 1).all()
+        has_more = len(attendance_logs) > limit
+        attendance_logs = attendance_logs[:limit]
         
         return jsonify({
-            'attendance': [log.to_dict() for log in attendance_logs]
+            'attendance': [AttendanceLog.row_to_dict(log) for log in attendance_logs],
+            'has_more': has_more,
+            'next_cursor': _encode_cursor(attendance_logs[-1]) if has_more else None
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _stream_history(query):
+    """Yield the history as one JSON document, a batch of rows at a time"""
+    yield '{"attendance": ['
+    batch_size = current_app.config['HISTORY_STREAM_BATCH_SIZE']
+    # yield_per streams from a server-side cursor where the driver supports it
+    for i, log in enumerate(query.yield_per(batch_size)):
+        yield (',' if i else '') + json.dumps(AttendanceLog.row_to_dict(log))
+    yield ']}'
+
+def _encode_cursor(log):
+    key = [log.date.isoformat(), log.time.isoformat(), log.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        day, at, log_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(day), dt_time.fromisoformat(at), str(log_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+
+EXPORT_COLUMNS = ['id', 'user_id', 'user_name', 'role', 'date', 'time', 'status', 'confidence', 'created_at']
+
+@attendance_bp.route('/export', methods=['GET'])
+@jwt_required()
+@roles_required('admin', 'teacher', error='Admin or teacher access required')
+def export_attendance():
+    """Stream attendance as CSV or NDJSON (admin/teacher only)
+    
+    Query params: format (csv or ndjson), start_date, end_date, role,
+    user_id and gzip=true to compress the download on the fly.
+    """
+    try:
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in ('csv', 'ndjson'):
+            return jsonify({'error': 'format must be csv or ndjson'}), 400
+        compress = request.args.get('gzip', 'false').lower() == 'true'
+        
+        # User name and role come from the join, not per-row lookups
+        query = db.session.query(
+            AttendanceLog.id, AttendanceLog.user_id, User.name, User.role,
+            AttendanceLog.date, AttendanceLog.time, AttendanceLog.status,
+            AttendanceLog.confidence, AttendanceLog.created_at
+        ).join(User, User.id == AttendanceLog.user_id)
+        
+        if request.args.get('user_id'):
+            query = query.filter(AttendanceLog.user_id == request.args.get('user_id'))
+        if request.args.get('role'):
+            query = query.filter(User.role == request.args.get('role'))
+        if request.args.get('start_date'):
+            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
+            query = query.filter(AttendanceLog.date >= start_date)
+        if request.args.get('end_date'):
+            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d').date()
+            query = query.filter(AttendanceLog.date <= end_date)
+        
+        query = query.order_by(AttendanceLog.date, AttendanceLog.time, AttendanceLog.id)
+        
+        chunks = _export_rows(query, export_format)
+        filename = f"attendance_{date.today().isoformat()}.{export_format}"
+        mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        if compress:
+            chunks = _gzip_chunks(chunks)
+            filename += '.gz'
+            mimetype = 'application/gzip'
+        
+        return Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _export_rows(query, export_format):
+    """Yield the export in text chunks of about one fetch batch each"""
+    batch_size = current_app.config['HISTORY_STREAM_BATCH_SIZE']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+    
+    for i, row in enumerate(query.yield_per(batch_size), 1):
+        values = [
+            value.isoformat() if isinstance(value, (date, datetime, dt_time)) else value
+            for value in row
+        ]
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, values)), ensure_ascii=False) + '\n')
+        if i % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _gzip_chunks(chunks):
+    """Gzip a stream of text chunks incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
 @attendance_bp.route('/today', methods=['GET'])
 @jwt_required()
 def get_today_attendance():
     try:
         today = date.today()
-        attendance_logs = AttendanceLog.query.filter_by(date=today).all()
+        attendance_logs = AttendanceLog.serialized_query().filter(AttendanceLog.date == today).all()
+        
+        # Totals come from the daily summary instead of counting the logs
+        by_role = DailyRoleAttendance.query.filter_by(date=today).all()
         
         return jsonify({
-            'attendance': [log.to_dict() for log in attendance_logs],
+            'attendance': [AttendanceLog.row_to_dict(log) for log in attendance_logs],
             'date': today.isoformat(),
-            'total_present': len([log for log in attendance_logs if log.status == 'present'])
+            'total_present': sum(summary.present_count for summary in by_role),
+            'by_role': [summary.to_dict() for summary in by_role]
         }), 200
         
     except Exception as e:
@@ -104,42 +254,170 @@ def get_today_attendance():
 @attendance_bp.route('/stats', methods=['GET'])
 @jwt_required()
 def get_attendance_stats():
+    """Attendance counts over the last `days` days (today included), read
+    from the daily summaries
+    
+    Query params: user_id, days, and for dashboards per_user=true (one
+    entry per active user, optionally filtered by role) and daily=true
+    (per-day series). Without user_id the counts are over the roster of
+    active users of `role` (default: students, who are the ones expected to
+    check in), so the rates are per user-day. Every variant costs at
+    most two queries whose cost depends on the window, not on the size of
+    the history. Days without a log count as absent.
+    """
     try:
         user_id = request.args.get('user_id')
+        role = request.args.get('role')
         days = int(request.args.get('days', 30))
+        if days < 1:
+            return jsonify({'error': 'days must be at least 1'}), 400
+        per_user = request.args.get('per_user', 'false').lower() == 'true'
+        daily = request.args.get('daily', 'false').lower() == 'true'
         
+        # Inclusive window of exactly `days` days ending today
         end_date = date.today()
-        start_date = end_date - timedelta(days=days)
-        
-        query = AttendanceLog.query.filter(
-            and_(
-                AttendanceLog.date >= start_date,
-                AttendanceLog.date <= end_date
-            )
-        )
-        
-        if user_id:
-            query = query.filter_by(user_id=user_id)
-        
-        logs = query.all()
-        
-        # Calculate stats
+        start_date = end_date - timedelta(days=days - 1)
         total_days = days
-        present_days = len([log for log in logs if log.status == 'present'])
-        attendance_rate = (present_days / total_days) * 100 if total_days > 0 else 0
         
-        return jsonify({
+        response = {
             'period': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
                 'total_days': total_days
-            },
-            'stats': {
-                'present_days': present_days,
-                'absent_days': total_days - present_days,
-                'attendance_rate': round(attendance_rate, 2)
             }
-        }), 200
+        }
+        
+        if per_user:
+            # Whole roster in one GROUP BY; users without check-ins still get a row
+            columns = [User.id, User.name, User.role, DailyUserAttendance.status]
+            if daily:
+                columns.append(DailyUserAttendance.date)
+            query = db.session.query(*columns, func.count(DailyUserAttendance.user_id)).outerjoin(
+                DailyUserAttendance, and_(
+                    DailyUserAttendance.user_id == User.id,
+                    DailyUserAttendance.date >= start_date,
+                    DailyUserAttendance.date <= end_date
+                )
+            ).filter(User.is_active == True)
+            if role:
+                query = query.filter(User.role == role)
+            if user_id:
+                query = query.filter(User.id == user_id)
+            rows = query.group_by(*columns).all()
+            
+            users = {}
+            for row in rows:
+                uid, name, user_role, status = row[:4]
+                entry = users.setdefault(uid, {
+                    'user_id': uid, 'name': name, 'role': user_role,
+                    'counts': {}, 'daily': []
+                })
+                if status is None:
+                    continue
+                entry['counts'][status] = entry['counts'].get(status, 0) + row[-1]
+                if daily:
+                    entry['daily'].append({'date': row[4].isoformat(), 'status': status})
+            
+            response['users'] = []
+            for entry in sorted(users.values(), key=lambda entry: entry['name']):
+                result = {
+                    'user_id': entry['user_id'],
+                    'name': entry['name'],
+                    'role': entry['role'],
+                    **_status_stats(entry['counts'], total_days)
+                }
+                if daily:
+                    result['daily'] = sorted(entry['daily'], key=lambda day: day['date'])
+                response['users'].append(result)
+            return jsonify(response), 200
+        
+        counts = {}
+        series = {}
+        roster_size = 1
+        if user_id:
+            columns = [DailyUserAttendance.status]
+            if daily:
+                columns.insert(0, DailyUserAttendance.date)
+            query = db.session.query(*columns, func.count(DailyUserAttendance.user_id)).filter(
+                DailyUserAttendance.user_id == user_id,
+                DailyUserAttendance.date >= start_date,
+                DailyUserAttendance.date <= end_date
+            )
+            if role:
+                query = query.filter(DailyUserAttendance.role == role)
+            for row in query.group_by(*columns).all():
+                status, count = row[-2], row[-1]
+                counts[status] = counts.get(status, 0) + count
+                if daily:
+                    series.setdefault(row[0], {})[status] = count
+        else:
+            # Same formula as the per-user path: only users expected to check in
+            role = role or 'student'
+            columns = [DailyRoleAttendance.date] if daily else []
+            query = db.session.query(
+                *columns,
+                func.sum(DailyRoleAttendance.present_count),
+                func.sum(DailyRoleAttendance.late_count),
+                func.sum(DailyRoleAttendance.absent_count)
+            ).filter(
+                DailyRoleAttendance.date >= start_date,
+                DailyRoleAttendance.date <= end_date
+            )
+            query = query.filter(DailyRoleAttendance.role == role)
+            if daily:
+                query = query.group_by(DailyRoleAttendance.date)
+            
+            # Denominator: every active user of the role on every day of the window
+            roster_size = db.session.query(func.count(User.id)).filter(
+                User.is_active == True, User.role == role
+            ).scalar()
+            response['role'] = role
+            response['roster_size'] = roster_size
+            
+            for row in query.all():
+                day_counts = dict(zip(('present', 'late', 'absent'), (int(n or 0) for n in row[-3:])))
+                for status, count in day_counts.items():
+                    counts[status] = counts.get(status, 0) + count
+                if daily:
+                    series[row[0]] = day_counts
+        
+        # Same arithmetic as the per-user path, over user-days for the roster
+        response['stats'] = _status_stats(counts, roster_size * total_days)
+        if daily:
+            response['daily'] = [
+                {
+                    'date': day.isoformat(),
+                    'present': series[day].get('present', 0),
+                    'late': series[day].get('late', 0),
+                    'absent': max(roster_size - series[day].get('present', 0) - series[day].get('late', 0), 0)
+                }
+                for day in sorted(series)
+            ]
+        return jsonify(response), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _status_stats(counts, total_days):
+    """Counts and rates over `total_days` (user-)days; late counts as attended
+    and days without a log count as absent"""
+    present = counts.get('present', 0)
+    late = counts.get('late', 0)
+    return {
+        'present_days': present,
+        'late_days': late,
+        'absent_days': max(total_days - present - late, 0),
+        'attendance_rate': round((present + late) / total_days * 100, 2) if total_days > 0 else 0,
+        'on_time_rate': round(present / total_days * 100, 2) if total_days > 0 else 0
+    }
+
+@attendance_bp.route('/buffer', methods=['GET'])
+@jwt_required()
+@roles_required('admin', error='Admin access required')
+def get_attendance_buffer():
+    """Depth of the write-behind attendance buffer (admin only)"""
+    try:
+        return jsonify({'buffer': attendance_buffer.stats()}), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
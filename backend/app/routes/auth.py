@@ -3,6 +3,7 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.models import db
 from app.models.user import User
+from app.services.rate_limiter import rate_limited
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -38,6 +39,7 @@ def register():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limited('login', key_by='ip', error='Too many login attempts, please try again later')
 def login():
     try:
         data = request.get_json()
@@ -1,92 +1,54 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
-from functools import wraps
-from datetime import datetime, date, timedelta
+from datetime import datetime, timedelta
 import base64
-import json
 import traceback
-import time
 from sqlalchemy import func
 from werkzeug.security import generate_password_hash
 
 from app.models import db
 from app.models.user import User
-from app.models.attendance import AttendanceLog
-from app.services.face_engine_simple import face_engine
+from app.services.face_engines import face_engines
+from app.services.gallery_cache import gallery_cache
+from app.services.encoding_executor import encoding_executor, EncodingQueueFull, EncodingTimeout
+from app.services.registration_jobs import registration_jobs
+from app.services.attendance_recorder import attendance_recorder
+from app.services.encoding_codec import pack_encodings, unpack_encodings, encoding_count
+from app.services.access_control import access_control, roles_required
+from app.services.rate_limiter import rate_limited
+from app.services.enrollment_staging import enrollment_staging
 
-# Rate limiting storage
-registration_attempts = {}
-
-# Decorator for admin/teacher only endpoints
-def admin_or_teacher_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role not in ['admin', 'teacher']:
-            return jsonify({'error': 'Yêu cầu quyền quản trị viên hoặc giáo viên'}), 403
-        return f(*args, **kwargs)
-    return decorated_function
+# Decorator for admin/teacher only endpoints (reads the token's role claim)
+admin_or_teacher_required = roles_required(
+    'admin', 'teacher', error='Yêu cầu quyền quản trị viên hoặc giáo viên'
+)
 
 face_bp = Blueprint('face', __name__)
 
-# Rate limiting decorator
-def rate_limit_register(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        user_id = get_jwt_identity()
-        current_time = time.time()
-        
-        # Clean up old entries
-        registration_attempts[user_id] = [t for t in registration_attempts.get(user_id, []) 
-                                        if current_time - t < 60]  # 1 minute window
-        
-        # Check rate limit (max 5 attempts per minute)
-        if len(registration_attempts.get(user_id, [])) >= 5:
-            return jsonify({
-                'error': 'Quá nhiều yêu cầu. Vui lòng thử lại sau 1 phút.'
-            }), 429
-            
-        # Record this attempt
-        if user_id not in registration_attempts:
-            registration_attempts[user_id] = []
-        registration_attempts[user_id].append(current_time)
-        
-        return f(*args, **kwargs)
-    return decorated_function
-
 @face_bp.route('/register-status/<string:user_id>', methods=['GET'])
 @jwt_required()
 def get_face_registration_status(user_id):
     """Get the current face registration status for a user"""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user:
-            return jsonify({'error': 'Người dùng không tồn tại'}), 404
-        
         # Check permissions
-        if str(current_user_id) != str(user_id) and current_user.role not in ['admin', 'teacher']:
+        if not access_control.is_self_or_role(user_id, 'admin', 'teacher'):
             return jsonify({'error': 'Không có quyền truy cập'}), 403
             
-        user = User.query.get(user_id)
+        user = User.query.options(db.undefer(User.face_encodings)).get(user_id)
         if not user:
             return jsonify({'error': 'Người dùng không tồn tại'}), 404
         
         # Check database encodings
         encodings_count = 0
-        encodings = []
         if user.face_encodings:
             try:
-                encodings = json.loads(user.face_encodings)
-                encodings_count = len(encodings)
+                encodings_count = encoding_count(user.face_encodings)
             except Exception as e:
                 print(f"Error parsing face encodings: {e}")
                 return jsonify({'error': 'Lỗi khi đọc dữ liệu khuôn mặt'}), 500
         
-        # Get temporary encodings count
-        temp_count = face_engine.get_face_encodings_count(user_id)
+        # Get staged (in-progress) encodings count
+        temp_count = enrollment_staging.count(user_id)
         total_count = encodings_count + temp_count
         
         # Calculate registration progress (0-100%)
@@ -115,54 +77,47 @@ def get_face_registration_status(user_id):
 
 @face_bp.route('/register', methods=['POST'])
 @jwt_required()
-@rate_limit_register
+@rate_limited('register', error='Quá nhiều yêu cầu. Vui lòng thử lại sau.')
 def register_face():
     try:
-        data = request.get_json()
+        data, image = _read_image_upload()
         print(f"Register face request received for user: {data.get('user_id')}")
         
-        if not data or not data.get('image_data'):
+        if not image:
             return jsonify({'error': 'Thiếu dữ liệu ảnh'}), 400
         
         user_id = data.get('user_id')
         if not user_id:
             return jsonify({'error': 'Thiếu ID người dùng'}), 400
+        
+        # Check permissions
+        if not access_control.is_self_or_role(user_id, 'admin', 'teacher'):
+            return jsonify({'error': 'Bạn không có quyền đăng ký khuôn mặt cho người khác'}), 403
             
         # Check if user exists and is active
-        user = User.query.get(user_id)
+        user = User.query.options(db.undefer(User.face_encodings)).get(user_id)
         if not user:
             return jsonify({'error': 'Người dùng không tồn tại'}), 404
         
         if not user.is_active:
             return jsonify({'error': 'Tài khoản người dùng đã bị vô hiệu hóa'}), 400
         
-        # Get current user making the request
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user:
-            return jsonify({'error': 'Người dùng hiện tại không tồn tại'}), 404
-        
-        # Check permissions
-        if str(current_user_id) != str(user_id) and current_user.role not in ['admin', 'teacher']:
-            return jsonify({'error': 'Bạn không có quyền đăng ký khuôn mặt cho người khác'}), 403
-        
-        # Decode base64 image
+        # Decode base64 image (binary uploads are used as-is)
         try:
             print("Decoding image data...")
-            if ',' in data['image_data']:
-                image_data = base64.b64decode(data['image_data'].split(',')[-1])
-            else:
-                image_data = base64.b64decode(data['image_data'])
+            image_data = image if isinstance(image, bytes) else _decode_base64_image(image)
             print(f"Image decoded successfully, size: {len(image_data)} bytes")
         except Exception as e:
             error_msg = f'Định dạng ảnh không hợp lệ: {str(e)}'
             print(error_msg)
             return jsonify({'error': error_msg}), 400
         
-        # Get face encoding using face_engine
+        # Get face encoding from the encoding pool
         print("Encoding face from image...")
-        face_encoding = face_engine.encode_face_from_image(image_data)
+        try:
+            face_encoding = encoding_executor.encode(image_data)
+        except (EncodingQueueFull, EncodingTimeout) as e:
+            return _encoding_unavailable(e)
         
         if face_encoding is None:
             return jsonify({
@@ -177,25 +132,14 @@ def register_face():
         if hasattr(face_encoding, 'tolist'):
             face_encoding = face_encoding.tolist()
         
-        # Add encoding to temporary storage
-        success = face_engine.add_face_encoding(user_id, face_encoding)
-        
-        if not success:
-            return jsonify({'error': 'Không thể lưu đặc trưng khuôn mặt'}), 400
+        # Stage the encoding where every worker sees it, and count in the same transaction
+        temp_count = enrollment_staging.append(user_id, face_encoding)
         
-        # Get current encodings count
-        temp_count = face_engine.get_face_encodings_count(user_id)
-        
-        # Get existing encodings from database
+        # Get existing encodings count from database
         db_count = 0
-        existing_encodings = []
         if user.face_encodings:
             try:
-                existing_encodings = json.loads(user.face_encodings)
-                # Ensure all encodings are lists, not numpy arrays
-                existing_encodings = [enc.tolist() if hasattr(enc, 'tolist') else enc 
-                                   for enc in existing_encodings]
-                db_count = len(existing_encodings)
+                db_count = encoding_count(user.face_encodings)
                 print(f"Found {db_count} existing encodings in database")
             except Exception as e:
                 print(f"Error loading existing encodings: {e}")
@@ -209,7 +153,7 @@ def register_face():
         
         # Check if we have enough images to complete registration
         if total_count >= 5:
-            return _complete_registration(user, existing_encodings, temp_count)
+            return _complete_registration(user)
         else:
             progress = (total_count / 5) * 100
             return jsonify({
@@ -234,23 +178,16 @@ def register_face():
             'details': str(e)
         }), 500
 
-def _complete_registration(user, existing_encodings, temp_count):
+def _complete_registration(user):
     """Helper function to complete face registration"""
     try:
         user_id = user.id
-        # Get new encodings from temporary storage
-        temp_encodings = face_engine.temp_face_encodings.get(user_id, [])
-        
-        # Ensure all encodings are lists, not numpy arrays
-        temp_encodings = [enc.tolist() if hasattr(enc, 'tolist') else enc 
-                         for enc in temp_encodings]
+        # Take the staged encodings; the user's row stays locked until the commit
+        temp_encodings = enrollment_staging.take(user_id)
         
-        # Ensure existing encodings are also lists
-        existing_encodings = [enc.tolist() if hasattr(enc, 'tolist') else enc 
-                            for enc in existing_encodings]
-        
-        # Combine existing and new encodings
-        all_encodings = existing_encodings.copy()
+        # Combine existing (re-read under the lock) and new encodings
+        db.session.refresh(user, ['face_encodings'])
+        all_encodings = list(unpack_encodings(user.face_encodings)) if user.face_encodings else []
         all_encodings.extend(temp_encodings)
         
         # Keep only the most recent encodings (max 10)
@@ -259,7 +196,7 @@ def _complete_registration(user, existing_encodings, temp_count):
         
         # Save to database
         try:
-            user.face_encodings = json.dumps(all_encodings)
+            user.face_encodings = pack_encodings(all_encodings)
             user.face_registered = True
             user.face_registered_at = datetime.utcnow()
             user.updated_at = datetime.utcnow()
@@ -272,15 +209,8 @@ def _complete_registration(user, existing_encodings, temp_count):
         # Refresh the user object to get the updated values
         db.session.refresh(user)
         
-        # Clear temporary storage
-        face_engine.clear_temp_encodings(user_id)
-        
-        # Reload face encodings for recognition
-        users_with_faces = User.query.filter(
-            User.face_encodings.isnot(None),
-            User.is_active == True
-        ).all()
-        face_engine.load_face_encodings_from_db(users_with_faces)
+        # Mark the recognition gallery as stale in every worker
+        gallery_cache.bump()
         
         print(f"Registration completed with {len(all_encodings)} encodings for user {user_id}")
         
@@ -308,12 +238,13 @@ def _complete_registration(user, existing_encodings, temp_count):
 
 @face_bp.route('/recognize', methods=['POST'])
 @jwt_required()
+@rate_limited('recognize', error='Quá nhiều yêu cầu nhận diện. Vui lòng thử lại sau.')
 def recognize_face():
     try:
         print("Received request to /api/face/recognize")
-        data = request.get_json()
+        data, image = _read_image_upload()
         
-        if not data or not data.get('image_data'):
+        if not image:
             print("Error: No image data provided")
             return jsonify({
                 'recognized': False,
@@ -323,11 +254,8 @@ def recognize_face():
         
         try:
             print("Attempting to decode image data...")
-            # Extract base64 data
-            if ',' in data['image_data']:
-                image_data = base64.b64decode(data['image_data'].split(',')[-1])
-            else:
-                image_data = base64.b64decode(data['image_data'])
+            # Extract base64 data (binary uploads are used as-is)
+            image_data = image if isinstance(image, bytes) else _decode_base64_image(image)
             print(f"Successfully decoded image data. Size: {len(image_data)} bytes")
         except Exception as e:
             error_msg = f"Error decoding image data: {str(e)}"
@@ -341,23 +269,31 @@ def recognize_face():
         
         try:
             print("Attempting face recognition...")
-            # Ensure face encodings are loaded
-            users_with_faces = User.query.filter(
-                User.face_encodings.isnot(None),
-                User.is_active == True
-            ).all()
-            
-            if not users_with_faces:
+            # Ensure face encodings are loaded (cached until the gallery changes)
+            face_engine = face_engines.get()
+            if not gallery_cache.ensure_loaded(face_engine):
                 return jsonify({
                     'recognized': False,
                     'error': 'Không có dữ liệu khuôn mặt nào trong hệ thống',
                     'code': 'NO_FACE_DATA'
                 }), 400
-                
-            face_engine.load_face_encodings_from_db(users_with_faces)
             
-            # Recognize face
-            user_id, confidence = face_engine.recognize_face(image_data)
+            # Classroom cameras: recognize every face in the frame
+            if _is_true(data.get('multi_face')):
+                if not face_engine.supports_multi_face:
+                    return jsonify({
+                        'recognized': False,
+                        'error': 'Engine nhận diện hiện tại không hỗ trợ nhận diện nhiều khuôn mặt',
+                        'code': 'MULTI_FACE_UNSUPPORTED'
+                    }), 400
+                return _recognize_all_faces(face_engine, image_data)
+            
+            # Encode in the pool, match against the gallery here
+            try:
+                face_encoding = encoding_executor.encode(image_data)
+            except (EncodingQueueFull, EncodingTimeout) as e:
+                return _encoding_unavailable(e)
+            user_id, confidence = face_engine.match_encoding(face_encoding)
             print(f"Face recognition result - User ID: {user_id}, Confidence: {confidence}")
             
             if user_id and confidence > 0.6:  # Confidence threshold
@@ -395,6 +331,50 @@ def recognize_face():
             'code': 'INTERNAL_SERVER_ERROR'
         }), 500
 
+def _recognize_all_faces(face_engine, image_data):
+    """Helper function to recognize every face in one frame and log attendance for all of them"""
+    # Detect and encode in the pool, match against the gallery here
+    try:
+        faces = face_engine.match_faces(encoding_executor.encode_all_faces(image_data))
+    except (EncodingQueueFull, EncodingTimeout) as e:
+        return _encoding_unavailable(e)
+    recognized = {
+        user_id: confidence for user_id, confidence, _ in faces
+        if user_id and confidence > 0.6  # Confidence threshold
+    }
+    logged = _log_recognized_users(recognized)
+    
+    results = []
+    for user_id, confidence, location in faces:
+        face = {
+            'recognized': user_id in logged,
+            'confidence': float(confidence) if confidence else 0.0,
+            'face_location': dict(zip(('top', 'right', 'bottom', 'left'), location)) if location else None
+        }
+        if user_id in logged:
+            user, attendance_id, already_logged = logged[user_id]
+            face.update({
+                'user': {
+                    'id': user.id,
+                    'name': user.name,
+                    'email': user.email,
+                    'role': user.role
+                },
+                'already_logged': already_logged,
+                'attendance_id': attendance_id
+            })
+        results.append(face)
+    
+    print(f"Multi-face recognition: {len(faces)} faces, {len(logged)} recognized")
+    return jsonify({
+        'recognized': bool(logged),
+        'faces': results,
+        'face_count': len(faces),
+        'recognized_count': len(logged),
+        'code': None if faces else 'NO_FACE_DETECTED',
+        'timestamp': datetime.utcnow().isoformat()
+    }), 200
+
 def _process_recognized_user(user_id, confidence):
     """Helper function to process recognized user and log attendance"""
     try:
@@ -408,13 +388,13 @@ def _process_recognized_user(user_id, confidence):
         
         print(f"Recognized user {user.name} with confidence {confidence}")
         
-        # Check if already logged today
-        today = date.today()
-        existing_log = AttendanceLog.query.filter_by(
-            user_id=user_id, date=today
-        ).first()
+        # Insert-or-ignore; repeat recognitions today are answered from memory
+        now = datetime.utcnow()
+        attendance_id, inserted = attendance_recorder.record(
+            {user.id: ('present', confidence)}, now=now
+        )[user.id]
         
-        if existing_log:
+        if not inserted:
             return jsonify({
                 'recognized': True,
                 'message': f'{user.name} đã điểm danh hôm nay',
@@ -426,22 +406,10 @@ def _process_recognized_user(user_id, confidence):
                 },
                 'confidence': float(confidence),
                 'already_logged': True,
-                'timestamp': datetime.utcnow().isoformat(),
-                'attendance_id': existing_log.id
+                'timestamp': now.isoformat(),
+                'attendance_id': attendance_id
             }), 200
         
-        # Log the attendance
-        now = datetime.utcnow()
-        attendance = AttendanceLog(
-            user_id=user.id,
-            date=today,
-            time=now.time(),
-            status='present',
-            confidence=float(confidence),
-            created_at=now
-        )
-        db.session.add(attendance)
-        db.session.commit()
         print("Attendance logged successfully")
         
         return jsonify({
@@ -456,7 +424,7 @@ def _process_recognized_user(user_id, confidence):
             'confidence': float(confidence),
             'already_logged': False,
             'timestamp': now.isoformat(),
-            'attendance_id': attendance.id
+            'attendance_id': attendance_id
         }), 200
         
     except Exception as e:
@@ -471,14 +439,210 @@ def _process_recognized_user(user_id, confidence):
             'code': 'USER_PROCESSING_ERROR'
         }), 500
 
+@face_bp.route('/recognize/batch', methods=['POST'])
+@jwt_required()
+def recognize_faces_batch():
+    """Recognize faces in several frames (possibly from several cameras) at once"""
+    try:
+        data = request.get_json(silent=True)
+        frames = data.get('frames', []) if isinstance(data, dict) else []
+        
+        # A list of data URLs or {"image_data": ..., "camera_id": ...} objects
+        if not isinstance(frames, list) or not all(
+            isinstance(frame, str) or (isinstance(frame, dict) and isinstance(frame.get('image_data'), str))
+            for frame in frames
+        ):
+            return jsonify({
+                'error': 'Danh sách khung hình không hợp lệ',
+                'code': 'INVALID_FRAMES'
+            }), 400
+        
+        if not frames:
+            return jsonify({
+                'error': 'Thiếu danh sách khung hình',
+                'code': 'MISSING_IMAGE_DATA'
+            }), 400
+        
+        max_frames = current_app.config['FACE_BATCH_MAX_FRAMES']
+        if len(frames) > max_frames:
+            return jsonify({
+                'error': f'Tối đa {max_frames} khung hình mỗi yêu cầu',
+                'code': 'TOO_MANY_FRAMES'
+            }), 400
+        
+        images = []
+        camera_ids = []
+        for frame in frames:
+            if isinstance(frame, dict):
+                image_data, camera_id = frame.get('image_data'), frame.get('camera_id')
+            else:
+                image_data, camera_id = frame, None
+            try:
+                images.append(_decode_base64_image(image_data))
+            except Exception as e:
+                print(f"Error decoding batch frame: {str(e)}")
+                images.append(None)
+            camera_ids.append(camera_id)
+        
+        face_engine = face_engines.get()
+        if not gallery_cache.ensure_loaded(face_engine):
+            return jsonify({
+                'error': 'Không có dữ liệu khuôn mặt nào trong hệ thống',
+                'code': 'NO_FACE_DATA'
+            }), 400
+        
+        valid = [i for i, image_data in enumerate(images) if image_data is not None]
+        try:
+            encodings = encoding_executor.encode_many([images[i] for i in valid])
+        except (EncodingQueueFull, EncodingTimeout) as e:
+            return _encoding_unavailable(e)
+        matches = [(None, 0.0)] * len(images)
+        for i, match in zip(valid, face_engine.match_encodings(encodings)):
+            matches[i] = match
+        
+        # Best confidence per recognized user across all frames
+        recognized = {}
+        for user_id, confidence in matches:
+            if user_id and confidence > 0.6:  # Confidence threshold
+                recognized[user_id] = max(confidence, recognized.get(user_id, 0.0))
+        logged = _log_recognized_users(recognized)
+        
+        results = []
+        for i, (user_id, confidence) in enumerate(matches):
+            result = {
+                'index': i,
+                'camera_id': camera_ids[i],
+                'recognized': False,
+                'confidence': float(confidence) if confidence else 0.0
+            }
+            if images[i] is None:
+                result['code'] = 'INVALID_IMAGE_FORMAT'
+            elif user_id in logged:
+                user, attendance_id, already_logged = logged[user_id]
+                result.update({
+                    'recognized': True,
+                    'user': {
+                        'id': user.id,
+                        'name': user.name,
+                        'email': user.email,
+                        'role': user.role
+                    },
+                    'already_logged': already_logged,
+                    'attendance_id': attendance_id
+                })
+            else:
+                result['code'] = 'LOW_CONFIDENCE' if confidence else 'NO_FACE_DETECTED'
+            results.append(result)
+        
+        return jsonify({
+            'results': results,
+            'frames': len(frames),
+            'recognized_count': len(logged),
+            'timestamp': datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        error_msg = f"Error in /recognize/batch endpoint: {str(e)}"
+        print(error_msg)
+        traceback.print_exc()
+        return jsonify({
+            'error': 'Lỗi máy chủ nội bộ',
+            'details': error_msg,
+            'type': type(e).__name__,
+            'code': 'INTERNAL_SERVER_ERROR'
+        }), 500
+
+def _read_image_upload():
+    """Read a single uploaded image and the other request fields
+    
+    Accepts, besides the original JSON body with a base64 data URL in
+    'image_data', a raw image body (Content-Type: image/jpeg or image/png,
+    other fields in the query string) or multipart/form-data with the image
+    in an 'image' file field. Binary uploads skip the base64 round trip and
+    are handed to the engine as bytes for cv2.imdecode.
+    
+    Returns:
+        (params, image): dict of request fields, and the image as bytes
+        (binary uploads) or a base64 string (JSON), or None if missing
+    """
+    if request.mimetype.startswith('image/'):
+        return request.args, request.get_data(cache=False)
+    
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        return request.form, upload.read() if upload else None
+    
+    data = request.get_json(silent=True) or {}
+    return data, data.get('image_data')
+
+def _encoding_unavailable(error):
+    """Response for an encoding job that was rejected or timed out"""
+    print(f"Encoding unavailable: {str(error)}")
+    if isinstance(error, EncodingTimeout):
+        return jsonify({
+            'recognized': False,
+            'error': 'Xử lý ảnh quá thời gian cho phép, vui lòng thử lại',
+            'code': 'ENCODING_TIMEOUT'
+        }), 504
+    response = jsonify({
+        'recognized': False,
+        'error': 'Hệ thống đang bận, vui lòng thử lại sau',
+        'code': 'ENCODING_BUSY'
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def _is_true(value):
+    """Interpret a JSON boolean or a form/query string flag"""
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def _decode_base64_image(image_data):
+    """Decode a base64 string or data URL into raw image bytes"""
+    if ',' in image_data:
+        image_data = image_data.split(',')[-1]
+    return base64.b64decode(image_data)
+
+def _log_recognized_users(recognized):
+    """Log attendance for several recognized users in a single transaction
+    
+    Args:
+        recognized: dict of user_id -> confidence
+        
+    Returns:
+        dict of user_id -> (user, attendance_id, already_logged) for users that exist
+    """
+    if not recognized:
+        return {}
+    
+    users = User.query.filter(User.id.in_(list(recognized))).all()
+    written = attendance_recorder.record(
+        {user.id: ('present', recognized[user.id]) for user in users}
+    )
+    
+    logged = {}
+    for user in users:
+        if user.id in written:
+            attendance_id, inserted = written[user.id]
+            logged[user.id] = (user, attendance_id, not inserted)
+    print(f"Logged attendance for {sum(1 for _, _, already in logged.values() if not already)} users")
+    return logged
+
 @face_bp.route('/register/batch', methods=['POST'])
 @jwt_required()
 def batch_register_faces():
     try:
-        data = request.get_json()
+        if request.mimetype == 'multipart/form-data':
+            # Several files in the 'images' field, sent without base64
+            data = request.form
+            images = [upload.read() for upload in request.files.getlist('images')]
+        else:
+            data = request.get_json(silent=True) or {}
+            images = data.get('images', [])
         
         user_id = data.get('user_id')
-        images = data.get('images', [])
         
         if not user_id or not images:
             return jsonify({'error': 'Thiếu user_id hoặc danh sách ảnh'}), 400
@@ -487,57 +651,41 @@ def batch_register_faces():
         if not user:
             return jsonify({'error': 'Người dùng không tồn tại'}), 404
         
-        all_encodings = []
-        successful_images = 0
-        
-        for image_data in images:
-            face_encoding = face_engine.encode_face_from_image(image_data)
-            if face_encoding is not None:
-                # Convert numpy array to list for storage
-                if hasattr(face_encoding, 'tolist'):
-                    face_encoding = face_encoding.tolist()
-                all_encodings.append(face_encoding)
-                successful_images += 1
-        
-        if successful_images == 0:
-            return jsonify({'error': 'Không thể trích xuất khuôn mặt từ bất kỳ ảnh nào'}), 400
-        
-        # Save all encodings to database
-        try:
-            user.face_encodings = json.dumps(all_encodings)
-            user.face_registered = True
-            user.face_registered_at = datetime.utcnow()
-            user.updated_at = datetime.utcnow()
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error saving batch encodings: {str(e)}")
-            return jsonify({
-                'error': 'Lỗi khi lưu dữ liệu khuôn mặt',
-                'details': str(e)
-            }), 500
-        
-        # Reload face encodings
-        try:
-            users_with_faces = User.query.filter(
-                User.face_encodings.isnot(None),
-                User.is_active == True
-            ).all()
-            face_engine.load_face_encodings_from_db(users_with_faces)
-        except Exception as e:
-            print(f"Error reloading face encodings: {str(e)}")
-            # Continue even if reloading fails, as the main operation succeeded
+        # Encode in the background; the client polls the job for progress
+        job_id = registration_jobs.submit(user.id, images, requested_by=str(get_jwt_identity()))
         
         return jsonify({
-            'message': f'Đăng ký thành công với {successful_images} ảnh',
-            'registered_images': successful_images,
-            'total_encodings': len(all_encodings),
-            'user_id': user_id,
+            'message': f'Đã nhận {len(images)} ảnh, đang xử lý',
+            'job_id': job_id,
+            'status': 'queued',
+            'total_images': len(images),
+            'status_url': f'/api/face/register/batch/{job_id}',
+            'user_id': user.id,
             'user_name': user.name
-        }), 200
+        }), 202
         
     except Exception as e:
         db.session.rollback()
         print(f"Error in batch_register_faces: {str(e)}")
         traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@face_bp.route('/register/batch/<string:job_id>', methods=['GET'])
+@jwt_required()
+def get_batch_register_job(job_id):
+    """Poll the state of a batch registration job"""
+    try:
+        job = registration_jobs.get(job_id)
+        if not job:
+            return jsonify({'error': 'Không tìm thấy công việc đăng ký'}), 404
+        
+        if str(get_jwt_identity()) != job['requested_by'] and \
+                not access_control.is_self_or_role(job['user_id'], 'admin', 'teacher'):
+            return jsonify({'error': 'Bạn không có quyền xem công việc này'}), 403
+        
+        return jsonify(job), 200
+        
+    except Exception as e:
+        print(f"Error in get_batch_register_job: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
@@ -2,9 +2,40 @@ import cv2
 import numpy as np
 import os
 import base64
+import threading
 from app.models import db
 from app.models.user import User
-from skimage.metrics import structural_similarity as ssim
+from app.services.gallery_cache import gallery_cache
+
+# Side of the square grayscale face templates
+TEMPLATE_SIZE = 64
+
+class Frame:
+    """An image decoded once, carrying its BGR and grayscale versions and
+    the Haar detections through detection, cropping and matching"""
+    
+    def __init__(self, bgr=None, gray=None):
+        self.bgr = bgr
+        self.gray = gray if gray is not None else cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        self.faces = None  # (x, y, w, h) boxes, set by FaceRecognizer.detect
+    
+    @classmethod
+    def decode(cls, image_data, grayscale=False):
+        """Decode encoded image bytes; returns None if they are not an image.
+        With grayscale=True only the grayscale image is decoded (bgr is None)."""
+        nparr = np.frombuffer(image_data, np.uint8)
+        if grayscale:
+            gray = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+            return cls(gray=gray) if gray is not None else None
+        bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        return cls(bgr=bgr) if bgr is not None else None
+    
+    def largest_face(self):
+        """Grayscale crop of the largest detection, or None if there is none"""
+        if self.faces is None or not len(self.faces):
+            return None
+        x, y, w, h = max(self.faces, key=lambda face: face[2] * face[3])
+        return self.gray[y:y + h, x:x + w]
 
 class FaceRecognizer:
     def __init__(self):
@@ -14,28 +45,35 @@ class FaceRecognizer:
         )
         # Dictionary to store face encodings (in-memory, consider using a database in production)
         self.face_encodings = {}
+        # Stacked face templates of registered users, one row per user
+        self.templates = np.empty((0, TEMPLATE_SIZE * TEMPLATE_SIZE), dtype=np.float32)
+        self.template_user_ids = []
+        self._templates_generation = None
+        self._templates_loaded = False
+        self._templates_lock = threading.Lock()
         
+    def detect(self, frame):
+        """Run Haar detection once per frame and keep the boxes on it"""
+        if frame.faces is None:
+            # Phát hiện khuôn mặt
+            frame.faces = self.face_cascade.detectMultiScale(
+                frame.gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(30, 30)
+            )
+        return frame.faces
+    
     def detect_faces(self, image_data):
         try:
             # Chuyển đổi dữ liệu ảnh từ base64 sang numpy array
-            nparr = np.frombuffer(image_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            frame = Frame.decode(image_data)
             
-            if img is None:
+            if frame is None:
                 print("Lỗi: Không thể giải mã ảnh")
                 return False, None
-                
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
-            # Phát hiện khuôn mặt
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30)
-            )
-            
-            return len(faces) > 0, img
+            return len(self.detect(frame)) > 0, frame.bgr
         except Exception as e:
             print(f"Lỗi trong detect_faces: {str(e)}")
             return False, None
@@ -71,6 +109,10 @@ class FaceRecognizer:
             # Save the face image to the database
             user.face_image = image_data
             db.session.commit()
+            
+            # Templates are rebuilt on the next recognition in every worker
+            self._templates_loaded = False
+            gallery_cache.bump()
             print(f"Successfully registered face for user {user_id}")
             return True
             
@@ -79,81 +121,90 @@ class FaceRecognizer:
             db.session.rollback()
             return False
             
+    def _face_template(self, face_gray):
+        """Turn a grayscale face crop into a flattened zero-mean, unit-norm float32 template"""
+        template = cv2.resize(face_gray, (TEMPLATE_SIZE, TEMPLATE_SIZE), interpolation=cv2.INTER_AREA)
+        template = cv2.equalizeHist(template).astype(np.float32).ravel()
+        template -= template.mean()
+        norm = np.linalg.norm(template)
+        if norm > 0:
+            template /= norm
+        return template
+    
+    def _ensure_templates(self):
+        """Decode and crop every stored face image once, rebuilding only when the
+        gallery generation changes (registration, user update or delete)"""
+        generation = gallery_cache.current_generation()
+        if self._templates_loaded and generation is not None and generation == self._templates_generation:
+            return
+        
+        with self._templates_lock:
+            generation = gallery_cache.current_generation()
+            if self._templates_loaded and generation is not None and generation == self._templates_generation:
+                return
+            
+            rows = db.session.query(User.id, User.face_image).filter(
+                User.face_image.isnot(None)
+            ).all()
+            
+            templates = []
+            user_ids = []
+            for user_id, face_image in rows:
+                try:
+                    stored = Frame.decode(face_image, grayscale=True)
+                    if stored is None:
+                        continue
+                    self.detect(stored)
+                    # Stored images without a detectable face are used whole
+                    face = stored.largest_face()
+                    templates.append(self._face_template(face if face is not None else stored.gray))
+                    user_ids.append(user_id)
+                except Exception as e:
+                    print(f"Error processing stored image for user {user_id}: {str(e)}")
+                    continue
+            
+            if templates:
+                self.templates = np.stack(templates)
+            else:
+                self.templates = np.empty((0, TEMPLATE_SIZE * TEMPLATE_SIZE), dtype=np.float32)
+            self.template_user_ids = user_ids
+            self._templates_generation = generation
+            self._templates_loaded = True
+            print(f"Loaded {len(user_ids)} face templates")
+    
     def recognize_face(self, image_data, threshold=0.6):
         """
         Recognize a face from the image data
         Returns: (user, confidence) or (None, 0.0) if no match found
         """
         try:
-            # Convert image data to numpy array
-            nparr = np.frombuffer(image_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Decode once; detection and matching share the frame
+            frame = Frame.decode(image_data)
             
-            if img is None:
+            if frame is None:
                 print("Error: Could not decode image")
                 return None, 0.0
                 
             # Check if there's a face in the image
-            has_face, _ = self.detect_faces(image_data)
-            if not has_face:
+            self.detect(frame)
+            face = frame.largest_face()
+            if face is None:
                 print("No face detected in the image")
                 return None, 0.0
                 
-            # In a real implementation, you would:
-            # 1. Encode the face in the image
-            # 2. Compare with stored encodings
-            # 3. Return the best match if confidence > threshold
-            
-            # For now, we'll do a simple check against stored face images
-            # This is a placeholder implementation and should be replaced with proper face recognition
-            users = User.query.filter(User.face_image.isnot(None)).all()
-            
-            if not users:
+            self._ensure_templates()
+            if not self.template_user_ids:
                 print("No registered faces found")
                 return None, 0.0
                 
-            # Convert input image to grayscale for comparison
-            gray_input = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            # Normalized cross-correlation of the face region against every template
+            scores = self.templates @ self._face_template(face)
+            best = int(np.argmax(scores))
+            highest_confidence = min(float(scores[best]), 1.0)
             
             best_match = None
-            highest_confidence = 0.0
-            
-            for user in users:
-                if not user.face_image:
-                    continue
-                    
-                # Decode stored face image
-                try:
-                    stored_img = cv2.imdecode(
-                        np.frombuffer(user.face_image, np.uint8), 
-                        cv2.IMREAD_COLOR
-                    )
-                    if stored_img is None:
-                        continue
-                        
-                    # Resize images to same dimensions for comparison
-                    stored_img = cv2.resize(stored_img, (img.shape[1], img.shape[0]))
-                    stored_gray = cv2.cvtColor(stored_img, cv2.COLOR_BGR2GRAY)
-                    
-                    # Calculate similarity (SSIM) between the two images
-                    try:
-                        # Resize if dimensions don't match
-                        if gray_input.shape != stored_gray.shape:
-                            stored_gray = cv2.resize(stored_gray, (gray_input.shape[1], gray_input.shape[0]))
-                            
-                        score = ssim(gray_input, stored_gray)
-                        
-                        if score > highest_confidence and score >= threshold:
-                            highest_confidence = score
-                            best_match = user
-                            
-                    except Exception as e:
-                        print(f"Error comparing images: {str(e)}")
-                        continue
-                        
-                except Exception as e:
-                    print(f"Error processing stored image for user {user.id}: {str(e)}")
-                    continue
+            if highest_confidence >= threshold:
+                best_match = User.query.get(self.template_user_ids[best])
             
             if best_match and highest_confidence >= threshold:
                 print(f"Match found: User {best_match.id} with confidence {highest_confidence}")
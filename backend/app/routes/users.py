@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from app.models import db
 from app.models.user import User
+from app.models.enrollment_staging import EnrollmentStagingEncoding
+from app.services.gallery_cache import gallery_cache
+from app.services.access_control import access_control
+from app.services.attendance_recorder import attendance_recorder
 
 users_bp = Blueprint('users', __name__)
 
@@ -62,6 +66,8 @@ def update_user(user_id):
             user.is_active = data['is_active']
         
         db.session.commit()
+        gallery_cache.bump()
+        access_control.invalidate(user_id)
         
         return jsonify({
             'message': 'User updated successfully',
@@ -81,16 +87,22 @@ def delete_user(user_id):
             return jsonify({'error': 'User not found'}), 404
         
         # Delete associated face data if it exists
-        if user.face_encodings is not None or user.face_image is not None:
+        if user.has_face_image or user.face_registered_at is not None:
             # Clear face-related data
             user.face_encodings = None
             user.face_image = None
             user.face_registered_at = None
-            db.session.commit()
-            
-        # Delete the user
+        
+        # Staged enrollment encodings; ON DELETE CASCADE is not enforced on
+        # SQLite (foreign keys are off by default), so delete them explicitly
+        EnrollmentStagingEncoding.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+        
+        # Delete the user (one transaction with the cleanup above)
         db.session.delete(user)
         db.session.commit()
+        gallery_cache.bump()
+        access_control.invalidate(user_id)
+        attendance_recorder.invalidate()
         
         return jsonify({
             'message': 'User deleted successfully'
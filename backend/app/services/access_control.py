@@ -0,0 +1,97 @@
+import threading
+import time
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
+
+
+class AccessControl:
+    """Authorization from signed JWT claims.
+
+    Role checks read the ``role`` claim that /api/auth/login signs into the
+    token instead of loading the user on every request. To keep revocation
+    working, every authenticated request also checks the user's current
+    role and active flag against a small per-process cache that lives for
+    ``AUTH_STATE_TTL`` seconds. A token is rejected when its user has been
+    deleted or deactivated, or when the user's role no longer matches the
+    claim. Changes made in this process take effect immediately through
+    :meth:`invalidate`. Other worker processes see them once their cached
+    entry expires.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ttl = 30.0
+        self._max_entries = 10000
+        self._states: Dict[str, Tuple[float, Optional[Tuple[str, bool]]]] = {}
+
+    def init_app(self, app, jwt) -> None:
+        self._ttl = app.config['AUTH_STATE_TTL']
+        self._max_entries = app.config['AUTH_STATE_CACHE_SIZE']
+        jwt.token_in_blocklist_loader(self._token_revoked)
+
+    def user_state(self, user_id) -> Optional[Tuple[str, bool]]:
+        """(role, is_active) of a user, or None if the user does not exist."""
+        user_id = str(user_id)
+        now = time.monotonic()
+        cached = self._states.get(user_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        from app.models import db
+        from app.models.user import User
+        row = db.session.query(User.role, User.is_active).filter(User.id == user_id).first()
+        state = (row.role, bool(row.is_active)) if row else None
+        with self._lock:
+            if len(self._states) >= self._max_entries:
+                self._states = {key: value for key, value in self._states.items() if value[0] > now}
+                if len(self._states) >= self._max_entries:
+                    self._states.clear()
+            self._states[user_id] = (now + self._ttl, state)
+        return state
+
+    def invalidate(self, user_id=None) -> None:
+        """Forget the cached state of one user (or of everyone)."""
+        with self._lock:
+            if user_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(str(user_id), None)
+
+    def _token_revoked(self, jwt_header, jwt_payload) -> bool:
+        state = self.user_state(jwt_payload['sub'])
+        if state is None or not state[1]:
+            return True
+        return 'role' in jwt_payload and jwt_payload['role'] != state[0]
+
+    def current_role(self) -> Optional[str]:
+        """Role claim of the current request's token."""
+        return get_jwt().get('role')
+
+    def has_role(self, *roles) -> bool:
+        return self.current_role() in roles
+
+    def is_self_or_role(self, user_id, *roles) -> bool:
+        """True if the token belongs to ``user_id`` or carries one of ``roles``."""
+        return str(get_jwt_identity()) == str(user_id) or self.has_role(*roles)
+
+
+# Global instance
+access_control = AccessControl()
+
+
+def roles_required(*roles, error='Insufficient permissions'):
+    """Allow the view only for tokens whose role claim is one of ``roles``.
+
+    Goes below ``@jwt_required()``.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not access_control.has_role(*roles):
+                return jsonify({'error': error}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,159 @@
+import numpy as np
+from typing import Optional, Tuple, List
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest neighbour index in pure NumPy.
+
+    Vectors are partitioned into ``nlist`` cells by k-means over the
+    descriptors. A search scans only the ``nprobe`` cells whose centroids are
+    closest to the query, so ``nprobe`` is the recall/speed knob: higher is
+    closer to exact search, lower is faster.
+
+    Each cell keeps its own vectors and integer labels; the gallery uses the
+    user index as the label so a search returns the best user directly.
+    """
+
+    def __init__(self, dim: int = 128, nlist: int = 0, nprobe: int = 8,
+                 train_size: int = 50000, iterations: int = 10, seed: int = 0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.trained_size = 0
+        self._cells: List[np.ndarray] = []
+        self._cell_norms: List[np.ndarray] = []
+        self._cell_labels: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(labels) for labels in self._cell_labels)
+
+    @staticmethod
+    def auto_nlist(n: int) -> int:
+        """Default number of cells for ``n`` vectors (about 4 * sqrt(n))."""
+        return max(1, int(4 * np.sqrt(n)))
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Fit the coarse quantizer with k-means on (a sample of) ``vectors``."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        nlist = min(self.nlist or self.auto_nlist(len(vectors)), len(vectors))
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.train_size:
+            sample = vectors[rng.choice(len(vectors), self.train_size, replace=False)]
+        else:
+            sample = vectors
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assign = _nearest(sample, centroids)
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.stack([np.bincount(assign, weights=sample[:, d], minlength=nlist)
+                             for d in range(self.dim)], axis=1).astype(np.float32)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            # Re-seed empty cells from random training points
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+
+        self.centroids = centroids
+        self.trained_size = len(vectors)
+        self._clear()
+
+    def build(self, vectors: np.ndarray, labels: np.ndarray, retrain: bool = True) -> None:
+        """Train (unless ``retrain`` is False and centroids exist) and index ``vectors``."""
+        if retrain or not len(self.centroids):
+            self.train(vectors)
+        else:
+            self._clear()
+        self.add(vectors, labels)
+
+    def add(self, vectors: np.ndarray, labels: np.ndarray) -> None:
+        """Add vectors with their integer labels to their nearest cells."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        labels = np.asarray(labels, dtype=np.int32)
+        if not len(vectors):
+            return
+        assign = _nearest(vectors, self.centroids)
+        for cell in np.unique(assign):
+            mask = assign == cell
+            block = vectors[mask]
+            self._cells[cell] = np.concatenate([self._cells[cell], block])
+            self._cell_norms[cell] = np.concatenate(
+                [self._cell_norms[cell], np.einsum('ij,ij->i', block, block)])
+            self._cell_labels[cell] = np.concatenate([self._cell_labels[cell], labels[mask]])
+
+    def remove(self, label: int, shift: bool = False) -> None:
+        """Remove every vector with ``label``.
+
+        Args:
+            label: Label to remove
+            shift: Also decrement all labels above ``label``, for callers
+                whose labels are positions in a list that just lost an item
+        """
+        for cell, labels in enumerate(self._cell_labels):
+            keep = labels != label
+            if not keep.all():
+                self._cells[cell] = self._cells[cell][keep]
+                self._cell_norms[cell] = self._cell_norms[cell][keep]
+                self._cell_labels[cell] = labels = labels[keep]
+            if shift:
+                labels[labels > label] -= 1
+
+    def search(self, queries: np.ndarray, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate closest vector for each query.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: label and Euclidean distance per
+            query; label is -1 when the probed cells are empty
+        """
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        best_labels = np.full(len(q), -1, dtype=np.int32)
+        best_sq = np.full(len(q), np.inf, dtype=np.float32)
+        if not len(self.centroids):
+            return best_labels, best_sq
+
+        probes = _closest_cells(q, self.centroids, nprobe)
+        q_sq = np.einsum('ij,ij->i', q, q)
+        for i in range(len(q)):
+            for cell in probes[i]:
+                labels = self._cell_labels[cell]
+                if not len(labels):
+                    continue
+                sq = q_sq[i] + self._cell_norms[cell] - 2.0 * (self._cells[cell] @ q[i])
+                j = int(np.argmin(sq))
+                if sq[j] < best_sq[i]:
+                    best_sq[i] = sq[j]
+                    best_labels[i] = labels[j]
+        return best_labels, np.sqrt(np.maximum(best_sq, 0.0))
+
+    def _clear(self) -> None:
+        n = len(self.centroids)
+        self._cells = [np.empty((0, self.dim), dtype=np.float32) for _ in range(n)]
+        self._cell_norms = [np.empty(0, dtype=np.float32) for _ in range(n)]
+        self._cell_labels = [np.empty(0, dtype=np.int32) for _ in range(n)]
+
+
+def _sq_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    sq = np.einsum('ij,ij->i', a, a)[:, None] + np.einsum('ij,ij->i', b, b)[None, :]
+    sq -= 2.0 * (a @ b.T)
+    return sq
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    """Index of the nearest centroid for each vector, computed in chunks."""
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk):
+        out[start:start + chunk] = np.argmin(_sq_distances(vectors[start:start + chunk], centroids), axis=1)
+    return out
+
+
+def _closest_cells(queries: np.ndarray, centroids: np.ndarray, nprobe: int) -> np.ndarray:
+    sq = _sq_distances(queries, centroids)
+    if nprobe >= len(centroids):
+        return np.argsort(sq, axis=1)
+    return np.argpartition(sq, nprobe - 1, axis=1)[:, :nprobe]
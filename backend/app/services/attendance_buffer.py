@@ -0,0 +1,242 @@
+import glob
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from datetime import date, datetime, time as dt_time
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process servers only, see _claim
+    fcntl = None
+
+
+class AttendanceBuffer:
+    """Write-behind buffer for attendance rows.
+
+    Rows are appended (and fsynced) to a per-process segment file in the
+    instance folder before the request returns; a background thread bulk
+    inserts them in batches of ``batch_size``, at the latest ``interval``
+    seconds after they were written. Each process holds an exclusive lock on
+    the segments it owns, so segments left behind by a crashed process are
+    unlocked and get claimed and replayed by any other process. Replay is
+    idempotent because rows keep their ids and inserts ignore conflicts on
+    (user_id, date).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.batch_size = 500
+        self.interval = 1.0
+        self._app = None
+        self._dir: Optional[str] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._token = None
+        self._active = None
+        self._pending = 0
+        self._seq = 0
+        self._thread = None
+        self.flushed_rows = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config['ATTENDANCE_WRITE_BEHIND']
+        self.batch_size = app.config['ATTENDANCE_FLUSH_BATCH_SIZE']
+        self.interval = app.config['ATTENDANCE_FLUSH_INTERVAL']
+        self._app = app
+        self._dir = os.path.join(app.instance_path, app.config['ATTENDANCE_BUFFER_DIR'])
+        if not self.enabled:
+            return
+        os.makedirs(self._dir, exist_ok=True)
+        # Replay what a previous run left behind before serving
+        try:
+            recovered = self.recover()
+            if recovered:
+                print(f"Recovered {recovered} buffered attendance rows")
+        except Exception as e:
+            print(f"Attendance buffer recovery failed: {str(e)}")
+
+    # Writing
+
+    def _ensure_started(self) -> None:
+        # Files, locks and threads are per process; a pre-fork server
+        # starts them again in each worker.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._active = None
+        self._pending = 0
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name='attendance-flusher', daemon=True)
+        self._thread.start()
+
+    def _open_segment(self) -> None:
+        self._seq += 1
+        path = os.path.join(self._dir, f"{self._token}.{self._seq}.active")
+        f = open(path, 'ab')
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._active = f
+
+    def append(self, rows: List[dict]) -> None:
+        """Durably buffer attendance rows (dicts of attendance_logs columns)."""
+        lines = b''.join(json.dumps(_encode_row(row)).encode() + b'\n' for row in rows)
+        with self._lock:
+            self._ensure_started()
+            self._active.write(lines)
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._pending += len(rows)
+            if self._pending >= self.batch_size:
+                self._wake.set()
+
+    # Flushing
+
+    def _run(self) -> None:
+        last_recover = 0.0
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.time() - last_recover > max(30.0, self.interval):
+                    self.recover()
+                    last_recover = time.time()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error flushing attendance buffer: {str(e)}")
+                traceback.print_exc()
+
+    def flush(self) -> int:
+        """Write this process's buffered rows to the database.
+
+        Returns:
+            int: Number of rows written
+        """
+        with self._lock:
+            if self._pid != os.getpid() or not self._pending:
+                return 0
+            # Seal the active segment (keeping its lock) and start a new one
+            sealed = self._active
+            sealed_path = sealed.name[:-len('.active')] + '.flushing'
+            os.rename(sealed.name, sealed_path)
+            self._pending = 0
+            self._open_segment()
+        try:
+            return self._replay(sealed_path)
+        finally:
+            sealed.close()
+
+    def recover(self) -> int:
+        """Claim and replay segments whose owning process is gone.
+
+        Returns:
+            int: Number of rows written
+        """
+        total = 0
+        for path in sorted(glob.glob(os.path.join(self._dir, '*.active')) +
+                           glob.glob(os.path.join(self._dir, '*.flushing'))):
+            f = self._claim(path)
+            if f is None:
+                continue
+            try:
+                total += self._replay(path)
+            finally:
+                f.close()
+        return total
+
+    def _claim(self, path: str):
+        """Open and lock a segment if no live process owns it, else return None."""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return None
+            if not os.path.exists(path):  # replayed by another process meanwhile
+                f.close()
+                return None
+        elif self._active is not None and self._pid == os.getpid() and path == self._active.name:
+            # Without file locks only our own active segment is known to be live
+            f.close()
+            return None
+        return f
+
+    def _replay(self, path: str) -> int:
+        from app.services.attendance_recorder import attendance_recorder
+
+        with open(path, 'rb') as f:
+            rows = []
+            for line in f:
+                try:
+                    rows.append(_decode_row(json.loads(line)))
+                except ValueError:
+                    # A torn last line from a crash mid-append
+                    print(f"Skipping unreadable line in {os.path.basename(path)}")
+        with self._app.app_context():
+            for start in range(0, len(rows), self.batch_size):
+                attendance_recorder.write_rows(rows[start:start + self.batch_size])
+        os.remove(path)
+        self.flushed_rows += len(rows)
+        self.last_flush_at = time.time()
+        return len(rows)
+
+    # Monitoring
+
+    def stats(self) -> dict:
+        """Buffer depth of this process and of all segments on disk."""
+        segments = glob.glob(os.path.join(self._dir, '*.active')) + \
+            glob.glob(os.path.join(self._dir, '*.flushing')) if self._dir and os.path.isdir(self._dir) else []
+        disk_rows = 0
+        oldest = None
+        for path in segments:
+            try:
+                with open(path, 'rb') as f:
+                    count = sum(1 for _ in f)
+                mtime = os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            disk_rows += count
+            if count and (oldest is None or mtime < oldest):
+                oldest = mtime
+        return {
+            'enabled': self.enabled,
+            'pid': os.getpid(),
+            'pending_rows': self._pending if self._pid == os.getpid() else 0,
+            'disk_segments': len(segments),
+            'disk_rows': disk_rows,
+            'oldest_segment_age': round(time.time() - oldest, 3) if oldest else None,
+            'flushed_rows': self.flushed_rows,
+            'last_flush_at': datetime.utcfromtimestamp(self.last_flush_at).isoformat() if self.last_flush_at else None,
+            'last_error': self.last_error,
+            'batch_size': self.batch_size,
+            'flush_interval': self.interval
+        }
+
+
+def _encode_row(row: dict) -> dict:
+    return {key: value.isoformat() if isinstance(value, (date, datetime, dt_time)) else value
+            for key, value in row.items()}
+
+
+def _decode_row(data: dict) -> dict:
+    data['date'] = date.fromisoformat(data['date'])
+    data['time'] = dt_time.fromisoformat(data['time'])
+    data['created_at'] = datetime.fromisoformat(data['created_at'])
+    return data
+
+
+# Global instance
+attendance_buffer = AttendanceBuffer()
@@ -0,0 +1,165 @@
+import threading
+import uuid
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db
+from app.models.attendance import AttendanceLog
+from app.services import attendance_summary
+from app.services.attendance_buffer import attendance_buffer
+
+
+class AttendanceRecorder:
+    """Writes at most one attendance log per user and day.
+
+    The database enforces the rule with the unique (user_id, date) index and
+    writes are insert-or-ignore, so concurrent kiosks cannot create
+    duplicates. Users already checked in today are remembered in memory
+    (user id -> attendance id), so repeat recognitions during the day are
+    answered without a database round trip. The cache only holds positive
+    entries and is reloaded when the day changes (or on :meth:`invalidate`),
+    so a miss in one worker process just falls through to the insert.
+
+    With the write-behind buffer enabled, buffered writes return as soon as
+    the rows are in the buffer's append log and the insert happens on its
+    flusher thread. Two processes recognizing the same user at the same
+    moment may then both report a fresh check-in; only one row is stored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day: Optional[date] = None
+        self._checked_in: Dict[str, str] = {}
+
+    def _ensure_day(self, day: date) -> None:
+        if self._day == day:
+            return
+        with self._lock:
+            if self._day == day:
+                return
+            rows = db.session.query(AttendanceLog.user_id, AttendanceLog.id).filter(
+                AttendanceLog.date == day
+            ).all()
+            self._checked_in = {user_id: attendance_id for user_id, attendance_id in rows}
+            self._day = day
+            print(f"Loaded {len(self._checked_in)} check-ins for {day.isoformat()}")
+
+    def invalidate(self) -> None:
+        """Forget the cached check-ins; the next lookup reloads them.
+
+        Call after deleting attendance logs or users in this process.
+        """
+        with self._lock:
+            self._day = None
+            self._checked_in = {}
+
+    def logged_today(self, user_id: str, day: Optional[date] = None) -> Optional[str]:
+        """Id of the user's attendance log for ``day`` (default today), or None."""
+        day = day or date.today()
+        self._ensure_day(day)
+        return self._checked_in.get(str(user_id))
+
+    def record(self, entries: Dict[str, Tuple[str, Optional[float]]], day: Optional[date] = None,
+               now: Optional[datetime] = None, buffered: bool = True) -> Dict[str, Tuple[str, bool]]:
+        """Insert attendance for several users in one statement and one commit.
+
+        Args:
+            entries: user_id -> (status, confidence)
+            day: Attendance date (default today)
+            now: Timestamp for the time column (default utcnow)
+            buffered: Go through the write-behind buffer when it is enabled
+
+        Returns:
+            dict of user_id -> (attendance_id, inserted); ``inserted`` is False
+            for users that already had a log for the day
+        """
+        day = day or date.today()
+        now = now or datetime.utcnow()
+        self._ensure_day(day)
+
+        results = {}
+        rows = []
+        for user_id, (status, confidence) in entries.items():
+            attendance_id = self._checked_in.get(user_id)
+            if attendance_id:
+                results[user_id] = (attendance_id, False)
+                continue
+            rows.append({
+                'id': str(uuid.uuid4()),
+                'user_id': user_id,
+                'date': day,
+                'time': now.time(),
+                'status': status,
+                'confidence': float(confidence) if confidence is not None else None,
+                'created_at': datetime.utcnow(),
+            })
+        if not rows:
+            return results
+
+        if buffered and attendance_buffer.enabled:
+            attendance_buffer.append(rows)
+            for row in rows:
+                results[row['user_id']] = (row['id'], True)
+                # The cache may have moved on to the next day meanwhile
+                if self._day == day:
+                    self._checked_in[row['user_id']] = row['id']
+            return results
+
+        self.write_rows(rows)
+
+        # Rows that lost a race against another writer keep the existing id
+        stored = dict(db.session.query(AttendanceLog.user_id, AttendanceLog.id).filter(
+            AttendanceLog.date == day,
+            AttendanceLog.user_id.in_([row['user_id'] for row in rows])
+        ).all())
+        for row in rows:
+            attendance_id = stored.get(row['user_id'])
+            if attendance_id is None:
+                continue
+            results[row['user_id']] = (attendance_id, attendance_id == row['id'])
+            if self._day == day:
+                self._checked_in[row['user_id']] = attendance_id
+        return results
+
+    def write_rows(self, rows) -> None:
+        """Insert-or-ignore attendance rows, update the daily summaries and commit."""
+        try:
+            inserted = self._insert_ignore(rows)
+            attendance_summary.apply_inserted(inserted)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _insert_ignore(self, rows) -> List[dict]:
+        """INSERT ... ON CONFLICT (user_id, date) DO NOTHING for the session's dialect.
+
+        Returns:
+            list: The rows that were actually inserted
+        """
+        table = AttendanceLog.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            stmt = postgresql.insert(table).on_conflict_do_nothing(index_elements=['user_id', 'date'])
+        elif dialect == 'sqlite':
+            stmt = sqlite.insert(table).on_conflict_do_nothing(index_elements=['user_id', 'date'])
+        else:
+            # No portable upsert: insert row by row, skipping duplicates
+            inserted = []
+            for row in rows:
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(table.insert(), row)
+                    inserted.append(row)
+                except IntegrityError:
+                    pass
+            return inserted
+        inserted_ids = set(db.session.execute(stmt.values(rows).returning(table.c.id)).scalars())
+        return [row for row in rows if row['id'] in inserted_ids]
+
+
+# Global instance
+attendance_recorder = AttendanceRecorder()
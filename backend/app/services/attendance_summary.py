@@ -0,0 +1,129 @@
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import db
+from app.models.attendance import AttendanceLog
+from app.models.attendance_summary import DailyUserAttendance, DailyRoleAttendance
+from app.models.user import User
+
+# Statuses with their own counter column in daily_role_attendance
+COUNTED_STATUSES = ('present', 'late', 'absent')
+
+
+def apply_inserted(rows: List[dict]) -> None:
+    """Add freshly inserted attendance rows to the daily summaries.
+
+    Runs inside the caller's transaction, so the summaries are committed
+    (or rolled back) together with the attendance rows.
+
+    Args:
+        rows: Inserted attendance_logs rows (dicts with user_id, date, status)
+    """
+    if not rows:
+        return
+    roles = dict(db.session.query(User.id, User.role).filter(
+        User.id.in_({row['user_id'] for row in rows})
+    ).all())
+
+    user_rows = []
+    role_counts = {}
+    for row in rows:
+        role = roles.get(row['user_id'])
+        if role is None:
+            continue
+        user_rows.append({'date': row['date'], 'user_id': row['user_id'], 'role': role, 'status': row['status']})
+        if row['status'] in COUNTED_STATUSES:
+            counts = role_counts.setdefault((row['date'], role), dict.fromkeys(COUNTED_STATUSES, 0))
+            counts[row['status']] += 1
+    if not user_rows:
+        return
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        db.session.execute(
+            insert(DailyUserAttendance.__table__).on_conflict_do_nothing(index_elements=['date', 'user_id']),
+            user_rows
+        )
+        if role_counts:
+            stmt = insert(DailyRoleAttendance.__table__)
+            db.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=['date', 'role'],
+                    set_={
+                        f'{status}_count': getattr(DailyRoleAttendance.__table__.c, f'{status}_count')
+                        + getattr(stmt.excluded, f'{status}_count')
+                        for status in COUNTED_STATUSES
+                    }
+                ),
+                [
+                    {'date': day, 'role': role, **{f'{status}_count': n for status, n in counts.items()}}
+                    for (day, role), counts in role_counts.items()
+                ]
+            )
+        return
+
+    # Other backends: read-modify-write through the ORM
+    for row in user_rows:
+        if db.session.get(DailyUserAttendance, (row['date'], row['user_id'])) is None:
+            db.session.add(DailyUserAttendance(**row))
+    for (day, role), counts in role_counts.items():
+        summary = db.session.get(DailyRoleAttendance, (day, role))
+        if summary is None:
+            summary = DailyRoleAttendance(date=day, role=role, present_count=0, late_count=0, absent_count=0)
+            db.session.add(summary)
+        for status, n in counts.items():
+            setattr(summary, f'{status}_count', getattr(summary, f'{status}_count') + n)
+
+
+def rebuild(start_date: Optional[date] = None, end_date: Optional[date] = None) -> int:
+    """Recompute the daily summaries from attendance_logs (backfill or repair).
+
+    Args:
+        start_date: First day to rebuild (default: earliest log)
+        end_date: Last day to rebuild (default: latest log)
+
+    Returns:
+        int: Number of (date, user) rows written
+    """
+    def in_range(column):
+        conditions = []
+        if start_date:
+            conditions.append(column >= start_date)
+        if end_date:
+            conditions.append(column <= end_date)
+        return conditions
+
+    try:
+        DailyUserAttendance.query.filter(*in_range(DailyUserAttendance.date)).delete(synchronize_session=False)
+        DailyRoleAttendance.query.filter(*in_range(DailyRoleAttendance.date)).delete(synchronize_session=False)
+
+        # The unique (user_id, date) index guarantees one log per user and day
+        logs = select(
+            AttendanceLog.date, AttendanceLog.user_id, User.role, AttendanceLog.status
+        ).join(User, User.id == AttendanceLog.user_id).where(*in_range(AttendanceLog.date))
+        result = db.session.execute(
+            DailyUserAttendance.__table__.insert().from_select(['date', 'user_id', 'role', 'status'], logs)
+        )
+
+        per_role = select(
+            DailyUserAttendance.date,
+            DailyUserAttendance.role,
+            *[
+                func.sum(case((DailyUserAttendance.status == status, 1), else_=0))
+                for status in COUNTED_STATUSES
+            ]
+        ).where(*in_range(DailyUserAttendance.date)).group_by(DailyUserAttendance.date, DailyUserAttendance.role)
+        db.session.execute(
+            DailyRoleAttendance.__table__.insert().from_select(
+                ['date', 'role'] + [f'{status}_count' for status in COUNTED_STATUSES], per_role
+            )
+        )
+        db.session.commit()
+        return result.rowcount
+    except Exception:
+        db.session.rollback()
+        raise
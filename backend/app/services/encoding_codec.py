@@ -0,0 +1,76 @@
+import json
+import struct
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+# Stored face encodings: an 11-byte header followed by count x dim
+# little-endian float32 values.
+#   magic (4s) | version (uint8) | dim (uint16) | count (uint32)
+MAGIC = b'FENC'
+VERSION = 1
+HEADER = struct.Struct('<4sBHI')
+DTYPE = np.dtype('<f4')
+
+
+def pack_encodings(encodings: Union[np.ndarray, Sequence]) -> Optional[bytes]:
+    """Serialize face encodings to the packed binary storage format.
+
+    Args:
+        encodings: Array of shape (count, dim) or a list of encodings
+
+    Returns:
+        Optional[bytes]: Packed blob, or None if there are no encodings
+    """
+    arr = np.asarray(encodings, dtype=DTYPE)
+    if arr.size == 0:
+        return None
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    count, dim = arr.shape
+    return HEADER.pack(MAGIC, VERSION, dim, count) + np.ascontiguousarray(arr).tobytes()
+
+
+def unpack_encodings(data: Union[bytes, bytearray, memoryview, str, None]) -> np.ndarray:
+    """Deserialize stored face encodings.
+
+    Legacy JSON text (a list of lists) is still accepted so rows written
+    before the binary format keep working.
+
+    Returns:
+        np.ndarray: float32 array of shape (count, dim); empty if no data
+
+    Raises:
+        ValueError: If the blob is not a valid encodings blob
+    """
+    if not data:
+        return np.empty((0, 0), dtype=np.float32)
+    if isinstance(data, str):
+        return np.asarray(json.loads(data), dtype=np.float32).reshape(-1, 128)
+
+    magic, version, dim, count = _read_header(data)
+    expected = HEADER.size + count * dim * DTYPE.itemsize
+    if len(data) != expected:
+        raise ValueError(f"Encodings blob has {len(data)} bytes, expected {expected}")
+    arr = np.frombuffer(data, dtype=DTYPE, count=count * dim, offset=HEADER.size)
+    return arr.reshape(count, dim).astype(np.float32, copy=False)
+
+
+def encoding_count(data: Union[bytes, bytearray, memoryview, str, None]) -> int:
+    """Number of encodings stored in a blob, read from the header only."""
+    if not data:
+        return 0
+    if isinstance(data, str):
+        return len(json.loads(data))
+    return _read_header(data)[3]
+
+
+def _read_header(data):
+    if len(data) < HEADER.size:
+        raise ValueError("Encodings blob is too short")
+    magic, version, dim, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a face encodings blob")
+    if version != VERSION:
+        raise ValueError(f"Unsupported face encodings version: {version}")
+    return magic, version, dim, count
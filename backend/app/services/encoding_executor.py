@@ -0,0 +1,199 @@
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+# Engine instance of the current pool worker process
+_worker_engine = None
+
+
+class EncodingQueueFull(RuntimeError):
+    """Raised when the encoding pool already has the maximum number of pending jobs."""
+
+
+class EncodingTimeout(RuntimeError):
+    """Raised when an encoding job does not finish before its deadline."""
+
+
+def _init_worker(engine_module: str) -> None:
+    """Pool initializer: load the engine and its models once per child."""
+    global _worker_engine
+    _worker_engine = importlib.import_module(engine_module).face_engine
+    if hasattr(_worker_engine, 'warm_up'):
+        _worker_engine.warm_up()
+
+
+def _encode_in_worker(image_data):
+    return _worker_engine.encode_face_from_image(image_data)
+
+
+def _encode_batch_in_worker(images):
+    return _worker_engine.encode_faces_batch(images)
+
+
+def _encode_all_in_worker(image_data):
+    return _worker_engine.encode_all_faces(image_data)
+
+
+def _ping():
+    return os.getpid()
+
+
+class EncodingExecutor:
+    """Bounded process pool for face encoding.
+
+    Decoding and encoding hold the GIL, so they run in child processes that
+    each load the engine once. At most ``workers + queue_size`` jobs may be
+    pending; further submissions fail fast with :class:`EncodingQueueFull`
+    and callers wait for a result at most ``timeout`` seconds. With
+    ``workers`` set to 0 encoding runs inline in the calling thread.
+    """
+
+    def __init__(self, engine_module: str = 'app.services.face_engine_simple'):
+        self.engine_module = engine_module
+        self.workers = 0
+        self.queue_size = 0
+        self.timeout = None
+        self._pool = None
+        self._pool_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        from app.services.face_engines import face_engines
+        self.engine_module = face_engines.module
+        self.workers = app.config['FACE_ENCODING_WORKERS']
+        self.queue_size = app.config['FACE_ENCODING_QUEUE_SIZE']
+        self.timeout = app.config['FACE_ENCODING_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Pools are per process: a pool created before a pre-fork server
+        # forks its workers must not be shared with them.
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.engine_module,)
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def start(self) -> None:
+        """Start the pool's children now instead of on the first request."""
+        if self.workers:
+            pool = self._get_pool()
+            for _ in range(self.workers):
+                pool.submit(_ping)
+
+    def _reset_pool(self, pool) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise EncodingQueueFull(f"Encoding queue is full ({self.workers + self.queue_size} pending jobs)")
+        pool = self._get_pool()
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset_pool(pool)
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future, pool
+
+    def _result(self, future, pool, timeout):
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise EncodingTimeout(f"Encoding did not finish within {timeout:.1f}s")
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            raise
+
+    def encode(self, image_data, timeout: Optional[float] = None):
+        """Encode the face in one image.
+
+        Args:
+            image_data: Image bytes or base64 string
+            timeout: Seconds to wait for the result (defaults to FACE_ENCODING_TIMEOUT)
+
+        Returns:
+            The engine's face encoding, or None if no face was found
+
+        Raises:
+            EncodingQueueFull: If too many jobs are already pending
+            EncodingTimeout: If the deadline passes
+        """
+        if not self.workers:
+            return importlib.import_module(self.engine_module).face_engine.encode_face_from_image(image_data)
+        future, pool = self._submit(_encode_in_worker, image_data)
+        return self._result(future, pool, timeout or self.timeout)
+
+    def encode_all_faces(self, image_data, timeout: Optional[float] = None) -> List:
+        """Encode every face in one frame (engines with ``supports_multi_face``).
+
+        Returns:
+            list: (encoding, (top, right, bottom, left)) per detected face
+
+        Raises:
+            EncodingQueueFull: If too many jobs are already pending
+            EncodingTimeout: If the deadline passes
+        """
+        if not self.workers:
+            return importlib.import_module(self.engine_module).face_engine.encode_all_faces(image_data)
+        future, pool = self._submit(_encode_all_in_worker, image_data)
+        return self._result(future, pool, timeout or self.timeout)
+
+    def encode_many(self, images: List, timeout: Optional[float] = None) -> List:
+        """Encode several images, sharing one deadline.
+
+        The images are split into one contiguous chunk per pool worker and
+        each chunk goes through the engine's ``encode_faces_batch``, so the
+        dlib engine computes a chunk's descriptors in one batched call while
+        the chunks run in parallel.
+
+        Returns:
+            list: One encoding (or None) per image
+
+        Raises:
+            EncodingQueueFull: If the batch does not fit in the queue
+            EncodingTimeout: If the deadline passes
+        """
+        if not self.workers:
+            return importlib.import_module(self.engine_module).face_engine.encode_faces_batch(images)
+        if not images:
+            return []
+
+        chunk_size = -(-len(images) // self.workers)  # ceil
+        submitted = []
+        try:
+            for start in range(0, len(images), chunk_size):
+                submitted.append(self._submit(_encode_batch_in_worker, images[start:start + chunk_size]))
+        except Exception:
+            for future, _ in submitted:
+                future.cancel()
+            raise
+
+        deadline = time.monotonic() + (timeout or self.timeout)
+        try:
+            return [encoding for future, pool in submitted
+                    for encoding in self._result(future, pool, max(0.0, deadline - time.monotonic()))]
+        except Exception:
+            for future, _ in submitted:
+                future.cancel()
+            raise
+
+
+# Global instance
+encoding_executor = EncodingExecutor()
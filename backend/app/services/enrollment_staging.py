@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+from sqlalchemy import delete, func
+
+from app.models import db
+from app.models.enrollment_staging import EnrollmentStagingEncoding
+from app.models.user import User
+from app.services.encoding_codec import pack_encodings, unpack_encodings
+
+
+class EnrollmentStaging:
+    """Encodings of an enrollment in progress, shared by all worker processes.
+
+    /api/face/register collects one encoding per call until the user has
+    enough to complete registration. The encodings are staged in the
+    enrollment_staging_encodings table, so consecutive calls may land on any
+    worker. Appends and takes lock the user's row (FOR UPDATE where the
+    database supports it; SQLite serializes writers anyway), which makes
+    append-and-count exact and lets only one request complete an enrollment.
+    Staged encodings older than ``FACE_ENROLLMENT_TTL`` seconds are ignored
+    and deleted by later appends.
+    """
+
+    def __init__(self):
+        self._ttl = 3600
+
+    def init_app(self, app) -> None:
+        self._ttl = app.config['FACE_ENROLLMENT_TTL']
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self._ttl)
+
+    def _lock_user(self, user_id: str) -> None:
+        db.session.query(User.id).filter(User.id == user_id).with_for_update().first()
+
+    def append(self, user_id: str, encoding) -> int:
+        """Stage one encoding and commit.
+
+        Returns:
+            int: Number of unexpired encodings staged for the user, this one included
+        """
+        user_id = str(user_id)
+        try:
+            self._lock_user(user_id)
+            db.session.execute(
+                delete(EnrollmentStagingEncoding).where(EnrollmentStagingEncoding.created_at < self._cutoff())
+            )
+            db.session.add(EnrollmentStagingEncoding(user_id=user_id, encoding=pack_encodings([encoding])))
+            db.session.flush()
+            count = self._count(user_id)
+            db.session.commit()
+            return count
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def count(self, user_id: str) -> int:
+        """Number of unexpired encodings staged for a user."""
+        return self._count(str(user_id))
+
+    def _count(self, user_id: str) -> int:
+        return db.session.query(func.count(EnrollmentStagingEncoding.id)).filter(
+            EnrollmentStagingEncoding.user_id == user_id,
+            EnrollmentStagingEncoding.created_at >= self._cutoff()
+        ).scalar()
+
+    def take(self, user_id: str) -> List[np.ndarray]:
+        """Remove and return the user's unexpired staged encodings, oldest first.
+
+        Runs in the caller's transaction and keeps the user's row locked, so
+        commit it together with the saved encodings. A concurrent take gets
+        nothing once the first one has committed.
+        """
+        user_id = str(user_id)
+        table = EnrollmentStagingEncoding.__table__
+        self._lock_user(user_id)
+        stmt = delete(table).where(table.c.user_id == user_id)
+        if db.session.get_bind().dialect.name in ('postgresql', 'sqlite'):
+            rows = db.session.execute(
+                stmt.returning(table.c.id, table.c.encoding, table.c.created_at)
+            ).all()
+        else:
+            rows = db.session.query(table.c.id, table.c.encoding, table.c.created_at).filter(
+                table.c.user_id == user_id
+            ).all()
+            db.session.execute(stmt)
+        cutoff = self._cutoff()
+        return [unpack_encodings(row.encoding)[0] for row in sorted(rows, key=lambda row: row.id)
+                if row.created_at >= cutoff]
+
+
+# Global instance
+enrollment_staging = EnrollmentStaging()
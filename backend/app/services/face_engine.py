@@ -1,6 +1,5 @@
 import dlib
 import numpy as np
-import json
 import cv2
 from PIL import Image
 import io
@@ -8,6 +7,16 @@ import base64
 import os
 from typing import Optional, Tuple, Dict, List, Union
 from dataclasses import dataclass
+from collections import defaultdict
+
+from app.services.face_gallery import FaceGallery
+from app.services.encoding_codec import pack_encodings, unpack_encodings
+from config import Config
+
+try:
+    import face_recognition_models  # Ships both model files (see requirements.txt)
+except ImportError:
+    face_recognition_models = None
 
 @dataclass
 class FaceRecognitionResult:
@@ -15,19 +24,39 @@ class FaceRecognitionResult:
     user_id: Optional[str]
     confidence: float
     face_location: Optional[Tuple[int, int, int, int]] = None  # top, right, bottom, left
+    face_encoding: Optional[np.ndarray] = None
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
 class FaceEngine:
-    def __init__(self):
-        """Initialize the face recognition engine."""
+    # The HOG detector finds every face in a frame
+    supports_multi_face = True
+
+    def __init__(self, detection_width: int = 480, detection_upsample: int = 1, crop_max_side: int = 160,
+                 tolerance: float = 0.6):
+        """Initialize the face recognition engine.
+
+        Args:
+            detection_width: Frames wider than this are downscaled to it for
+                HOG detection (0 disables downscaling)
+            detection_upsample: Upsampling passes for the HOG detector
+            crop_max_side: Frames whose longer side is at most this many
+                pixels are treated as a face crop and detection is skipped
+                (0 disables)
+            tolerance: Distance tolerance for face matching (lower is more strict)
+        """
+        self.tolerance = tolerance
+        self.detection_width = detection_width
+        self.detection_upsample = detection_upsample
+        self.crop_max_side = crop_max_side
         # Initialize detector lazily to avoid memory issues
         self.detector = None
         self.shape_predictor = None
         self.face_encoder = None
-        # Store multiple encodings per user: {user_id: [encoding1, encoding2, ...]}
-        self.known_face_encodings: Dict[str, List[np.ndarray]] = {}
-        self.known_face_ids: List[str] = []
+        # All enrolled encodings in one N x 128 matrix, grouped per user
+        self.gallery = FaceGallery(dim=128)
+        # Encodings collected during registration: {user_id: [encoding1, ...]}
+        self.temp_face_encodings: Dict[str, List[list]] = defaultdict(list)
         self._models_loaded = False
 
     def load_models(self) -> None:
@@ -47,6 +76,8 @@ class FaceEngine:
 
             # Load shape predictor
             predictor_path = os.path.join(current_dir, 'shape_predictor_68_face_landmarks.dat')
+            if not os.path.exists(predictor_path) and face_recognition_models is not None:
+                predictor_path = face_recognition_models.pose_predictor_model_location()
             if not os.path.exists(predictor_path):
                 raise FileNotFoundError(f"Shape predictor model not found at: {predictor_path}")
 
@@ -54,6 +85,8 @@ class FaceEngine:
 
             # Load face recognition model
             model_path = os.path.join(current_dir, 'dlib_face_recognition_resnet_model_v1.dat')
+            if not os.path.exists(model_path) and face_recognition_models is not None:
+                model_path = face_recognition_models.face_recognition_model_location()
             if not os.path.exists(model_path):
                 raise FileNotFoundError(f"Face recognition model not found at: {model_path}")
 
@@ -66,23 +99,31 @@ class FaceEngine:
             self._models_loaded = False
             raise RuntimeError(f"Failed to load models: {str(e)}")
 
+    def warm_up(self) -> None:
+        """Load the models and run one dummy inference through every stage.
+
+        Raises:
+            RuntimeError: If models fail to load
+        """
+        self.load_models()
+        dummy = np.full((150, 150, 3), 128, dtype=np.uint8)
+        self.detector(dummy, 0)
+        shape = self.shape_predictor(dummy, dlib.rectangle(0, 0, 149, 149))
+        self.face_encoder.compute_face_descriptor(dummy, shape)
+
     def load_face_encodings_from_db(self, users):
         """Load face encodings from user database"""
-        self.known_face_encodings = []
-        self.known_face_ids = []
-        
+        entries = []
         for user in users:
             if user.face_encodings and user.is_active:  # Sửa thành face_encodings
                 try:
-                    encodings_list = json.loads(user.face_encodings)  # Sửa thành face_encodings
-                    for encoding in encodings_list:
-                        self.known_face_encodings.append(np.array(encoding))
-                        self.known_face_ids.append(user.id)
-                    print(f"Loaded {len(encodings_list)} face encodings for user {user.name}")
+                    entries.append((user.id, unpack_encodings(user.face_encodings)))
                 except Exception as e:
                     print(f"Error loading face encodings for user {user.id}: {e}")
-        
-        print(f"Total loaded face encodings: {len(self.known_face_encodings)}")
+
+        self.gallery.load(entries)
+        print(f"Total loaded face encodings: {len(self.gallery)} ({self.gallery.user_count} users)")
+
     def _process_image(self, image_data: Union[bytes, str]) -> Optional[np.ndarray]:
         """Process image data and convert to RGB numpy array."""
         try:
@@ -110,6 +151,33 @@ class FaceEngine:
             print(f"Error processing image: {str(e)}")
             return None
 
+    def _detect_faces(self, rgb_img: np.ndarray) -> List['dlib.rectangle']:
+        """Detect faces, returning boxes in full-resolution coordinates.
+
+        Large frames are downscaled to ``detection_width`` before the HOG
+        detector runs, and the boxes are scaled back so landmarks and
+        descriptors are computed on the full-resolution frame. A frame small
+        enough to be a face crop is returned as a single full-frame box.
+        """
+        height, width = rgb_img.shape[:2]
+        if self.crop_max_side and max(height, width) <= self.crop_max_side:
+            return [dlib.rectangle(0, 0, width - 1, height - 1)]
+
+        if not self.detection_width or width <= self.detection_width:
+            return list(self.detector(rgb_img, self.detection_upsample))
+
+        scale = width / float(self.detection_width)
+        small = cv2.resize(
+            rgb_img, (self.detection_width, int(round(height / scale))), interpolation=cv2.INTER_AREA
+        )
+        return [
+            dlib.rectangle(
+                int(det.left() * scale), int(det.top() * scale),
+                int(det.right() * scale), int(det.bottom() * scale)
+            )
+            for det in self.detector(small, self.detection_upsample)
+        ]
+
     def get_face_encoding(self, image_data: Union[bytes, str, np.ndarray]) -> Optional[bytes]:
         """Extract face encoding from an image.
         
@@ -128,7 +196,7 @@ class FaceEngine:
                 return None
             
             # Detect faces
-            dets = self.detector(rgb_img, 1)
+            dets = self._detect_faces(rgb_img)
             if not dets:
                 print("No faces detected in the image")
                 return None
@@ -146,9 +214,37 @@ class FaceEngine:
             print(f"Error in get_face_encoding: {str(e)}")
             return None
 
-    def encode_face_from_image(self, image_data: Union[bytes, str, np.ndarray]) -> Optional[bytes]:
-        """Alias for get_face_encoding for backward compatibility."""
-        return self.get_face_encoding(image_data)
+    def encode_face_from_image(self, image_data: Union[bytes, str, np.ndarray]) -> Optional[np.ndarray]:
+        """Encoding of the largest face as an array, or None if no face was found."""
+        face_encoding = self.get_face_encoding(image_data)
+        if face_encoding is None:
+            return None
+        return np.frombuffer(face_encoding, dtype=np.float64)
+
+    def match_encoding(self, unknown_encoding) -> Tuple[Optional[str], float]:
+        """Match an already computed encoding against the gallery.
+
+        Returns:
+            tuple: (user_id, confidence), or (None, 0.0) if nothing matches
+        """
+        return self.match_encodings([unknown_encoding])[0]
+
+    def match_encodings(self, encodings: List[Optional[np.ndarray]]) -> List[Tuple[Optional[str], float]]:
+        """Match several already computed encodings (None for no face) in one matrix operation.
+
+        Returns:
+            list: One (user_id, confidence) tuple per encoding
+        """
+        results = [(None, 0.0)] * len(encodings)
+        found = [i for i, enc in enumerate(encodings) if enc is not None]
+        if not found or not len(self.gallery):
+            return results
+
+        user_ids, distances = self.gallery.match_many(np.stack([encodings[i] for i in found]))
+        for i, user_id, distance in zip(found, user_ids, distances):
+            if user_id is not None and distance < self.tolerance:
+                results[i] = (user_id, max(0.0, 1.0 - float(distance)))
+        return results
 
     def recognize_face(
         self, 
@@ -174,40 +270,16 @@ class FaceEngine:
                 
             face_encoding_np = np.frombuffer(face_encoding, dtype=np.float64)
             
-            if not self.known_face_encodings:
+            if not len(self.gallery):
                 print("No known face encodings loaded")
                 return FaceRecognitionResult(None, 0.0)
 
-            best_match_id = None
-            best_confidence = 0.0
-            best_distance = float('inf')
-
-            for user_id, encodings in self.known_face_encodings.items():
-                if not encodings:
-                    continue
-                    
-                # Calculate distances to all encodings for this user
-                distances = []
-                for enc in encodings:
-                    if isinstance(enc, list):
-                        enc = np.array(enc, dtype=np.float64)
-                    elif isinstance(enc, bytes):
-                        enc = np.frombuffer(enc, dtype=np.float64)
-                    
-                    # Calculate Euclidean distance between encodings
-                    distance = np.linalg.norm(face_encoding_np - enc)
-                    distances.append(distance)
-                
-                # Use the best match for this user
-                if distances:
-                    min_distance = min(distances)
-                    confidence = max(0.0, 1.0 - min_distance)
-                    
-                    # Update best match if this is better
-                    if confidence > best_confidence and confidence > (1.0 - tolerance):
-                        best_confidence = confidence
-                        best_match_id = user_id
-                        best_distance = min_distance
+            # One matrix product against the whole gallery, reduced per user
+            best_match_id, best_distance = self.gallery.best_match(face_encoding_np)
+            best_confidence = max(0.0, 1.0 - best_distance)
+            if best_distance >= tolerance:
+                best_match_id = None
+                best_confidence = 0.0
 
             # Create result object
             result = FaceRecognitionResult(
@@ -226,8 +298,134 @@ class FaceEngine:
             print(f"Error in recognize_face: {str(e)}")
             return FaceRecognitionResult(None, 0.0)
 
+    def encode_faces_batch(self, images: List[Union[bytes, str, np.ndarray]]) -> List[Optional[np.ndarray]]:
+        """Extract the largest face's encoding from each of several images.
+
+        Landmarks are computed per image, then all descriptors are computed
+        in one batched ``compute_face_descriptor`` call.
+
+        Args:
+            images: List of images in any format accepted by get_face_encoding
+
+        Returns:
+            list: One float64 encoding per image, or None where no face was found
+        """
+        self.load_models()
+        results: List[Optional[np.ndarray]] = [None] * len(images)
+        batch_imgs = []
+        batch_shapes = []
+        batch_index = []
+
+        for i, image_data in enumerate(images):
+            try:
+                rgb_img = self._process_image(image_data)
+                if rgb_img is None:
+                    continue
+                dets = self._detect_faces(rgb_img)
+                if not dets:
+                    continue
+                det = max(dets, key=lambda det: (det.right() - det.left()) * (det.bottom() - det.top()))
+                shapes = dlib.full_object_detections()
+                shapes.append(self.shape_predictor(rgb_img, det))
+                batch_imgs.append(rgb_img)
+                batch_shapes.append(shapes)
+                batch_index.append(i)
+            except Exception as e:
+                print(f"Error preparing image {i} for batch encoding: {str(e)}")
+
+        if batch_imgs:
+            descriptors = self.face_encoder.compute_face_descriptor(batch_imgs, batch_shapes)
+            for i, faces in zip(batch_index, descriptors):
+                results[i] = np.array(faces[0])
+        return results
+
+    def encode_all_faces(
+        self, image_data: Union[bytes, str, np.ndarray]
+    ) -> List[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+        """Encode every face detected in an image.
+
+        Landmarks for all detections go into one ``full_object_detections``
+        so the descriptors are computed in a single batched call.
+
+        Returns:
+            list: (encoding, (top, right, bottom, left)) per detected face
+        """
+        try:
+            self.load_models()
+            rgb_img = self._process_image(image_data)
+            if rgb_img is None:
+                return []
+
+            dets = self._detect_faces(rgb_img)
+            if not dets:
+                return []
+
+            shapes = dlib.full_object_detections()
+            for det in dets:
+                shapes.append(self.shape_predictor(rgb_img, det))
+            descriptors = self.face_encoder.compute_face_descriptor(rgb_img, shapes)
+
+            return [
+                (np.array(descriptor), (det.top(), det.right(), det.bottom(), det.left()))
+                for det, descriptor in zip(dets, descriptors)
+            ]
+
+        except Exception as e:
+            print(f"Error in encode_all_faces: {str(e)}")
+            return []
+
+    def match_faces(
+        self, faces: List[Tuple[np.ndarray, Tuple[int, int, int, int]]]
+    ) -> List[Tuple[Optional[str], float, Tuple[int, int, int, int]]]:
+        """Match the faces of one frame, assigning each user at most once.
+
+        Args:
+            faces: (encoding, location) pairs from encode_all_faces
+
+        Returns:
+            list: One (user_id, confidence, (top, right, bottom, left)) tuple per face
+        """
+        if not faces or not len(self.gallery):
+            return [(None, 0.0, location) for _, location in faces]
+
+        user_ids, distances = self.gallery.match_unique(
+            np.stack([encoding for encoding, _ in faces]), self.tolerance
+        )
+        return [
+            (user_id, max(0.0, 1.0 - float(distance)) if user_id is not None else 0.0, location)
+            for (_, location), user_id, distance in zip(faces, user_ids, distances)
+        ]
+
+    def recognize_all_faces(
+        self, image_data: Union[bytes, str, np.ndarray]
+    ) -> List[Tuple[Optional[str], float, Tuple[int, int, int, int]]]:
+        """Recognize every face in an image, assigning each user at most once.
+
+        Returns:
+            list: One (user_id, confidence, (top, right, bottom, left)) tuple per detected face
+        """
+        return self.match_faces(self.encode_all_faces(image_data))
+
+    def recognize_faces_batch(
+        self, images: List[Union[bytes, str, np.ndarray]]
+    ) -> List[Tuple[Optional[str], float]]:
+        """Recognize the largest face in each of several images.
+
+        Descriptors are computed in one batched call and matched against the
+        gallery in one matrix operation.
+
+        Returns:
+            list: One (user_id, confidence) tuple per image
+        """
+        try:
+            encodings = self.encode_faces_batch(images)
+        except Exception as e:
+            print(f"Error in recognize_faces_batch: {str(e)}")
+            return [(None, 0.0) for _ in images]
+        return self.match_encodings(encodings)
+
     def add_face_encoding(self, user_id: str, face_encoding: Union[bytes, np.ndarray, list]) -> bool:
-        """Add a new face encoding for a user.
+        """Add a new face encoding for a user to temporary storage.
         
         Args:
             user_id: ID of the user
@@ -242,11 +440,6 @@ class FaceEngine:
         try:
             user_id = str(user_id)  # Ensure consistent string IDs
             
-            if user_id not in self.known_face_encodings:
-                self.known_face_encodings[user_id] = []
-                if user_id not in self.known_face_ids:
-                    self.known_face_ids.append(user_id)
-            
             # Convert to numpy array if needed
             if isinstance(face_encoding, bytes):
                 face_encoding = np.frombuffer(face_encoding, dtype=np.float64)
@@ -254,7 +447,7 @@ class FaceEngine:
                 face_encoding = np.array(face_encoding, dtype=np.float64)
             
             # Store as list for JSON serialization
-            self.known_face_encodings[user_id].append(face_encoding.tolist())
+            self.temp_face_encodings[user_id].append(face_encoding.tolist())
             return True
             
         except Exception as e:
@@ -262,7 +455,7 @@ class FaceEngine:
             return False
         
     def get_face_encodings(self, user_id: str) -> List[np.ndarray]:
-        """Get all face encodings for a user.
+        """Get all temporary face encodings for a user.
         
         Args:
             user_id: ID of the user
@@ -270,10 +463,10 @@ class FaceEngine:
         Returns:
             list: List of face encodings as numpy arrays
         """
-        return [np.array(enc) for enc in self.known_face_encodings.get(str(user_id), [])]
+        return [np.array(enc) for enc in self.temp_face_encodings.get(str(user_id), [])]
         
     def get_face_encodings_count(self, user_id: str) -> int:
-        """Get number of face encodings for a user.
+        """Get number of temporary face encodings for a user.
         
         Args:
             user_id: ID of the user
@@ -281,22 +474,35 @@ class FaceEngine:
         Returns:
             int: Number of face encodings
         """
-        return len(self.known_face_encodings.get(str(user_id), []))
+        return len(self.temp_face_encodings.get(str(user_id), []))
         
-    def save_face_encodings(self, user_id: str) -> Optional[str]:
-        """Save all face encodings for a user to a JSON string.
+    def save_face_encodings(self, user_id: str) -> Optional[bytes]:
+        """Save all face encodings for a user to the packed storage format.
         
         Args:
             user_id: ID of the user
             
         Returns:
-            str: JSON string of face encodings or None if no encodings
+            bytes: Packed face encodings or None if no encodings
         """
         user_id = str(user_id)
-        if user_id in self.known_face_encodings and self.known_face_encodings[user_id]:
-            return json.dumps(self.known_face_encodings[user_id])
+        if self.temp_face_encodings.get(user_id):
+            return pack_encodings(self.temp_face_encodings[user_id])
         return None
 
+    def clear_temp_encodings(self, user_id: str) -> None:
+        """Clear temporary encodings for a user.
+
+        Args:
+            user_id: ID of the user
+        """
+        self.temp_face_encodings.pop(str(user_id), None)
+
 
 # Global instance
-face_engine = FaceEngine()
+face_engine = FaceEngine(
+    detection_width=Config.FACE_DETECTION_WIDTH,
+    detection_upsample=Config.FACE_DETECTION_UPSAMPLE,
+    crop_max_side=Config.FACE_CROP_MAX_SIDE,
+    tolerance=0.6
+)
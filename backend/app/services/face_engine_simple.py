@@ -1,49 +1,42 @@
 # app/services/face_engine_simple.py
+import cv2
 import numpy as np
-import json
 import base64
-from PIL import Image
-import io
 from collections import defaultdict
 import hashlib
 
+from app.services.face_gallery import FaceGallery
+from app.services.encoding_codec import pack_encodings, unpack_encodings
+
 class SimpleFaceEngine:
+    # Encodes the whole frame and has no face detector, so it cannot tell
+    # the faces of a classroom frame apart
+    supports_multi_face = False
+    
     def __init__(self, tolerance=0.8):  # Increased default tolerance
         self.tolerance = tolerance
         self.temp_face_encodings = defaultdict(list)
-        self.known_face_encodings = []
-        self.known_face_ids = []
+        self.gallery = FaceGallery(dim=128)
     
     def load_face_encodings_from_db(self, users):
-        """Load face encodings from user database with detailed debug info"""
-        self.known_face_encodings = []
-        self.known_face_ids = []
-        
+        """Load face encodings from user database into the gallery matrix"""
+        entries = []
         for user in users:
             if user.face_encodings and user.is_active:
                 try:
-                    encodings_list = json.loads(user.face_encodings)
-                    for i, encoding in enumerate(encodings_list):
-                        encoding_array = np.array(encoding, dtype=np.float32)
-                        # Ensure encoding is normalized to [-1, 1] range
-                        if encoding_array.max() > 1.0 or encoding_array.min() < -1.0:
-                            print(f"Warning: Encoding {i} for user {user.id} has values outside [-1, 1] range")
-                            # Normalize if needed
-                            encoding_array = np.clip(encoding_array, -1.0, 1.0)
-                        
-                        print(f"User {user.id} encoding {i}: shape={encoding_array.shape}, "
-                              f"range=[{encoding_array.min():.3f}, {encoding_array.max():.3f}]")
-                        
-                        self.known_face_encodings.append(encoding_array)
-                        self.known_face_ids.append(user.id)
-                    
-                    print(f"Loaded {len(encodings_list)} face encodings for user {user.name}")
+                    encodings = unpack_encodings(user.face_encodings)
+                    # Ensure encodings are normalized to [-1, 1] range
+                    if encodings.size and (encodings.max() > 1.0 or encodings.min() < -1.0):
+                        print(f"Warning: Encodings for user {user.id} have values outside [-1, 1] range")
+                        encodings = np.clip(encodings, -1.0, 1.0)
+                    entries.append((user.id, encodings))
                 except Exception as e:
                     print(f"Error loading face encodings for user {user.id}: {e}")
                     import traceback
                     traceback.print_exc()
         
-        print(f"Total loaded face encodings: {len(self.known_face_encodings)}")
+        self.gallery.load(entries)
+        print(f"Total loaded face encodings: {len(self.gallery)} ({self.gallery.user_count} users)")
     
     def encode_face_from_image(self, image_data):
         """
@@ -75,22 +68,22 @@ class SimpleFaceEngine:
                 image_bytes = image_data
             
             try:
-                # Open and preprocess image
-                image = Image.open(io.BytesIO(image_bytes))
-                image.verify()
-                image = Image.open(io.BytesIO(image_bytes))  # Reopen after verify
+                # Decode once, straight to grayscale, from a view of the bytes
+                image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+                if image is None:
+                    print("Error processing image: could not decode image data")
+                    return None
                 
                 # Basic validation
-                width, height = image.size
+                height, width = image.shape
                 if width < 100 or height < 100:
                     print("Image is too small to contain a face")
                     return None
                 
-                print(f"Processing image: {width}x{height}, format: {image.format}")
+                print(f"Processing image: {width}x{height}")
                 
-                # Convert to grayscale and resize for consistency
-                image = image.convert('L')  # Convert to grayscale
-                image = image.resize((100, 100))  # Resize to fixed dimensions
+                # Resize for consistency (INTER_AREA averages like PIL's antialiased resize)
+                image = cv2.resize(image, (100, 100), interpolation=cv2.INTER_AREA)
                 
                 # Create a more stable encoding using pixel sampling
                 encoding = []
@@ -100,7 +93,7 @@ class SimpleFaceEngine:
                     y = (i * 17) % 100  # 17 is another prime number
                     
                     # Get pixel value and normalize to [-1, 1]
-                    pixel = image.getpixel((x, y)) / 255.0  # Normalize to [0, 1]
+                    pixel = image[y, x] / 255.0  # Normalize to [0, 1]
                     encoding.append((pixel - 0.5) * 2)  # Convert to [-1, 1]
                 
                 # Add some noise based on image hash for uniqueness
@@ -133,6 +126,11 @@ class SimpleFaceEngine:
             traceback.print_exc()
             return None
     
+    def warm_up(self):
+        """Run one dummy encoding so imports and decoders are initialized before traffic"""
+        _, buffer = cv2.imencode('.jpg', np.full((128, 128), 128, dtype=np.uint8))
+        self.encode_face_from_image(buffer.tobytes())
+    
     def add_face_encoding(self, user_id, face_encoding):
         """Add face encoding to temporary storage for training"""
         if face_encoding is not None:
@@ -153,7 +151,7 @@ class SimpleFaceEngine:
         if encodings:
             # Clear temporary storage after saving
             self.temp_face_encodings[user_id] = []
-            return json.dumps(encodings)
+            return pack_encodings(encodings)
         return None
     
     def clear_temp_encodings(self, user_id):
@@ -164,40 +162,32 @@ class SimpleFaceEngine:
     
     def recognize_face(self, image_data):
         """Recognize face from image data using simulated matching"""
+        return self.match_encoding(self.encode_face_from_image(image_data))
+
+    def match_encoding(self, unknown_encoding):
+        """Match an already computed encoding against the gallery
+
+        Returns:
+            A (user_id, confidence) tuple, or (None, 0.0) if nothing matches
+        """
         try:
-            # Encode the unknown face
-            unknown_encoding = self.encode_face_from_image(image_data)
             if unknown_encoding is None:
                 print("No face found in image for recognition")
                 return None, 0.0
-            
+
             unknown_encoding = np.array(unknown_encoding)
             
-            if len(self.known_face_encodings) == 0:
+            if not len(self.gallery):
                 print("No known face encodings loaded")
                 return None, 0.0
             
-            print(f"Loaded {len(self.known_face_encodings)} known encodings")
-            print(f"Unknown encoding range: [{unknown_encoding.min():.3f}, {unknown_encoding.max():.3f}]")
-            
-            # Calculate distances to all known encodings
-            best_match_index = -1
-            best_distance = float('inf')
-            distances = []
-            
-            for i, known_encoding in enumerate(self.known_face_encodings):
-                distance = np.linalg.norm(unknown_encoding - known_encoding)
-                distances.append(distance)
-                if distance < best_distance:
-                    best_distance = distance
-                    best_match_index = i
+            # Distances to the whole gallery in one matrix operation
+            user_id, best_distance = self.gallery.best_match(unknown_encoding)
+            print(f"Best match distance: {best_distance:.3f} over {len(self.gallery)} encodings, "
+                  f"tolerance: {self.tolerance}")
             
-            print(f"All distances: {[f'{d:.3f}' for d in distances]}")
-            print(f"Best match distance: {best_distance:.3f}, tolerance: {self.tolerance}")
-            
-            if best_match_index >= 0 and best_distance <= self.tolerance:
+            if user_id is not None and best_distance <= self.tolerance:
                 confidence = 1 - (best_distance / self.tolerance)  # Normalize confidence
-                user_id = self.known_face_ids[best_match_index]
                 print(f"Face recognized: user_id={user_id}, confidence={confidence:.3f}")
                 return user_id, confidence
             
@@ -210,5 +200,40 @@ class SimpleFaceEngine:
             traceback.print_exc()
             return None, 0.0
 
+    def encode_faces_batch(self, images):
+        """Encode several images (one at a time; there is no model to batch)
+
+        Returns:
+            A list with one encoding (or None) per image
+        """
+        return [self.encode_face_from_image(image_data) for image_data in images]
+
+    def recognize_faces_batch(self, images):
+        """Recognize faces in several images, matching all of them in one matrix operation
+
+        Returns:
+            A list with one (user_id, confidence) tuple per image
+        """
+        return self.match_encodings(self.encode_faces_batch(images))
+
+    def match_encodings(self, encodings):
+        """Match several already computed encodings (None for no face) in one matrix operation
+
+        Returns:
+            A list with one (user_id, confidence) tuple per encoding
+        """
+        results = [(None, 0.0)] * len(encodings)
+        found = [i for i, encoding in enumerate(encodings) if encoding is not None]
+        if not found or not len(self.gallery):
+            return results
+
+        user_ids, distances = self.gallery.match_many(np.stack([encodings[i] for i in found]))
+        for i, user_id, distance in zip(found, user_ids, distances):
+            if user_id is not None and distance <= self.tolerance:
+                results[i] = (user_id, 1 - (float(distance) / self.tolerance))
+        print(f"Batch recognition: {len(encodings)} images, {len(found)} encoded, "
+              f"{sum(1 for user_id, _ in results if user_id)} recognized")
+        return results
+
 # Global face engine instance
 face_engine = SimpleFaceEngine(tolerance=0.6)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import importlib
+
+# FACE_ENGINE values and the module whose ``face_engine`` instance serves them
+ENGINE_MODULES = {
+    # Whole-frame pixel sampling, no models and no face detector
+    'simple': 'app.services.face_engine_simple',
+    # dlib HOG detector, 68-point landmarks and ResNet descriptors
+    'dlib': 'app.services.face_engine',
+}
+
+
+class FaceEngines:
+    """Selects the face engine the routes, the encoding pool and warm-up use.
+
+    Both engines expose the same interface:
+
+    - ``encode_face_from_image(image)`` -> encoding array or None
+    - ``encode_faces_batch(images)`` -> one encoding or None per image
+      (the dlib engine computes all descriptors in one batched call)
+    - ``match_encoding(encoding)`` -> (user_id, confidence)
+    - ``match_encodings(encodings)`` -> [(user_id, confidence)]
+    - ``encode_all_faces(image)`` -> [(encoding, (top, right, bottom, left))]
+      and ``match_faces(faces)`` -> [(user_id, confidence, location)], only
+      where ``supports_multi_face`` is True
+    - ``warm_up()``, ``gallery`` and ``load_face_encodings_from_db(users)``
+    """
+
+    def __init__(self):
+        self.name = 'simple'
+        self.module = ENGINE_MODULES[self.name]
+
+    def init_app(self, app) -> None:
+        name = app.config['FACE_ENGINE']
+        if name not in ENGINE_MODULES:
+            raise ValueError(f"Unknown FACE_ENGINE {name!r}, expected one of {', '.join(ENGINE_MODULES)}")
+        self.name = name
+        self.module = ENGINE_MODULES[name]
+
+    def get(self):
+        """The configured engine instance (imported on first use)."""
+        return importlib.import_module(self.module).face_engine
+
+
+# Global instance
+face_engines = FaceEngines()
@@ -0,0 +1,259 @@
+import numpy as np
+from typing import Optional, Tuple, List, Iterable, Sequence, Union
+
+from app.services.ann_index import IVFIndex
+
+
+class FaceGallery:
+    """Enrolled face descriptors kept in one contiguous float32 matrix.
+
+    Rows are grouped per user: ``user_offsets[i]:user_offsets[i + 1]`` are the
+    rows of ``user_ids[i]`` and ``row_user`` holds the owning user index of
+    every row, so a single matrix product gives the distances to the whole
+    gallery and ``np.minimum.reduceat`` reduces them to one distance per user.
+
+    With the ANN mode configured, galleries of at least ``ann_min_size``
+    descriptors are searched through an :class:`IVFIndex` instead; smaller
+    galleries always use the exact scan.
+    """
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+        self.encodings = np.empty((0, dim), dtype=np.float32)
+        self.sq_norms = np.empty(0, dtype=np.float32)
+        self.row_user = np.empty(0, dtype=np.int32)
+        self.user_offsets = np.zeros(1, dtype=np.int64)
+        self.user_ids: List[str] = []
+        self.ann_min_size = 20000
+        self.index: Optional[IVFIndex] = None
+
+    def __len__(self) -> int:
+        return self.encodings.shape[0]
+
+    def configure_ann(self, enabled: bool, min_size: int = 20000, nlist: int = 0, nprobe: int = 8) -> None:
+        """Enable or disable approximate search for large galleries.
+
+        Args:
+            enabled: Use the IVF index once the gallery reaches ``min_size``
+            min_size: Gallery size below which exact search is always used
+            nlist: Number of k-means cells (0 picks about 4 * sqrt(N))
+            nprobe: Cells scanned per query; the recall/speed knob
+
+        A new index is not built here: the next :meth:`load` builds it, or
+        the first search if no load follows.
+        """
+        self.ann_min_size = min_size
+        if not enabled:
+            self.index = None
+            return
+        if self.index is None or self.index.nlist != nlist:
+            self.index = IVFIndex(dim=self.dim, nlist=nlist, nprobe=nprobe)
+        self.index.nprobe = nprobe
+
+    @property
+    def uses_index(self) -> bool:
+        return self.index is not None and len(self) >= self.ann_min_size
+
+    @property
+    def user_count(self) -> int:
+        return len(self.user_ids)
+
+    def load(self, entries: Iterable[Tuple[str, Union[np.ndarray, Sequence]]]) -> None:
+        """Rebuild the gallery from ``(user_id, encodings)`` pairs.
+
+        Args:
+            entries: Iterable of user ids with their list/array of descriptors
+        """
+        user_ids = []
+        blocks = []
+        counts = []
+        for user_id, encodings in entries:
+            block = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+            if block.shape[0] == 0:
+                continue
+            user_ids.append(str(user_id))
+            blocks.append(block)
+            counts.append(block.shape[0])
+
+        if blocks:
+            self.encodings = np.ascontiguousarray(np.concatenate(blocks))
+        else:
+            self.encodings = np.empty((0, self.dim), dtype=np.float32)
+        self.user_ids = user_ids
+        self._reindex(np.asarray(counts, dtype=np.int64))
+        self._rebuild_index()
+
+    def add_user(self, user_id: str, encodings: Union[np.ndarray, Sequence]) -> None:
+        """Add (or replace) one user's descriptors without a full reload."""
+        user_id = str(user_id)
+        self.remove_user(user_id)
+        block = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if not len(block):
+            return
+        counts = np.append(np.diff(self.user_offsets), len(block))
+        self.encodings = np.concatenate([self.encodings, block])
+        self.user_ids.append(user_id)
+        self._reindex(counts)
+        if self._index_in_sync(len(self) - len(block)):
+            self.index.add(block, np.full(len(block), len(self.user_ids) - 1, dtype=np.int32))
+        else:
+            self._rebuild_index()
+
+    def remove_user(self, user_id: str) -> bool:
+        """Remove one user's descriptors without a full reload.
+
+        Returns:
+            bool: True if the user was in the gallery
+        """
+        try:
+            pos = self.user_ids.index(str(user_id))
+        except ValueError:
+            return False
+        start, end = self.user_offsets[pos], self.user_offsets[pos + 1]
+        counts = np.delete(np.diff(self.user_offsets), pos)
+        self.encodings = np.delete(self.encodings, np.s_[start:end], axis=0)
+        del self.user_ids[pos]
+        self._reindex(counts)
+        if self._index_in_sync(len(self) + int(end - start)):
+            self.index.remove(pos, shift=True)
+        else:
+            self._rebuild_index()
+        return True
+
+    def _index_in_sync(self, indexed_size: int) -> bool:
+        """Whether the index can be updated incrementally.
+
+        True when the index is in use and held exactly ``indexed_size``
+        vectors (the gallery size before the current change).
+        """
+        return self.uses_index and self.index.trained_size > 0 and len(self.index) == indexed_size
+
+    def _ensure_index(self) -> None:
+        """Build an index configured since the last load before searching it."""
+        if self.uses_index and not self.index.trained_size:
+            self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        """Rebuild the IVF index, retraining only when the size has drifted.
+
+        Centroids are reused while the gallery stays within a factor of two
+        of the size they were trained on, so reloads after a registration
+        only reassign vectors to cells.
+        """
+        if not self.uses_index:
+            return
+        trained = self.index.trained_size
+        retrain = not trained or not (trained / 2 <= len(self) <= trained * 2)
+        self.index.build(self.encodings, self.row_user, retrain=retrain)
+
+    def _reindex(self, counts: np.ndarray) -> None:
+        """Recompute offsets, row owners and squared norms from per-user counts."""
+        self.user_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.user_offsets[1:])
+        self.row_user = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+        self.sq_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+
+    def distances(self, queries: np.ndarray) -> np.ndarray:
+        """Euclidean distances from each query to every gallery row.
+
+        Args:
+            queries: Array of shape (dim,) or (Q, dim)
+
+        Returns:
+            np.ndarray: (N,) for a single query, (Q, N) otherwise
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        single = q.ndim == 1
+        q = q.reshape(-1, self.dim)
+        # ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x
+        sq = np.einsum('ij,ij->i', q, q)[:, None] + self.sq_norms[None, :]
+        sq -= 2.0 * (q @ self.encodings.T)
+        np.maximum(sq, 0.0, out=sq)
+        dist = np.sqrt(sq)
+        return dist[0] if single else dist
+
+    def user_distances(self, queries: np.ndarray) -> np.ndarray:
+        """Minimum distance from each query to each enrolled user.
+
+        Returns:
+            np.ndarray: (U,) for a single query, (Q, U) otherwise
+        """
+        dist = self.distances(queries)
+        return np.minimum.reduceat(dist, self.user_offsets[:-1], axis=-1)
+
+    def best_match(self, query: np.ndarray) -> Tuple[Optional[str], float]:
+        """Find the closest enrolled user for one descriptor.
+
+        Returns:
+            Tuple[Optional[str], float]: (user_id, distance), or (None, inf)
+            if the gallery is empty
+        """
+        if not len(self):
+            return None, float('inf')
+        self._ensure_index()
+        if self.uses_index:
+            labels, dists = self.index.search(query)
+            if labels[0] < 0:
+                return None, float('inf')
+            return self.user_ids[labels[0]], float(dists[0])
+        per_user = self.user_distances(query)
+        best = int(np.argmin(per_user))
+        return self.user_ids[best], float(per_user[best])
+
+    def match_many(self, queries: np.ndarray) -> Tuple[List[Optional[str]], np.ndarray]:
+        """Find the closest enrolled user for each of several descriptors.
+
+        Returns:
+            Tuple[List[Optional[str]], np.ndarray]: user ids and distances,
+            one per query
+        """
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if not len(self) or not len(q):
+            return [None] * len(q), np.full(len(q), np.inf, dtype=np.float32)
+        self._ensure_index()
+        if self.uses_index:
+            labels, dists = self.index.search(q)
+            return [self.user_ids[i] if i >= 0 else None for i in labels], dists
+        per_user = self.user_distances(q)
+        best = np.argmin(per_user, axis=1)
+        return [self.user_ids[i] for i in best], per_user[np.arange(len(q)), best]
+
+    def match_unique(self, queries: np.ndarray, tolerance: float) -> Tuple[List[Optional[str]], np.ndarray]:
+        """Match several faces from one frame so no user is assigned twice.
+
+        Face/user pairs are taken greedily in order of increasing distance,
+        skipping pairs whose face or user is already taken or whose distance
+        is not below ``tolerance``.
+
+        Returns:
+            Tuple[List[Optional[str]], np.ndarray]: user id (or None) and
+            distance per query
+        """
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        user_ids: List[Optional[str]] = [None] * len(q)
+        distances = np.full(len(q), np.inf, dtype=np.float32)
+        if not len(self) or not len(q):
+            return user_ids, distances
+
+        if self.uses_index:
+            # Only each face's best user is known; the closest face keeps it
+            best_ids, best_dists = self.match_many(q)
+            taken = set()
+            for i in np.argsort(best_dists):
+                distances[i] = best_dists[i]
+                if best_ids[i] is not None and best_ids[i] not in taken and best_dists[i] < tolerance:
+                    user_ids[i] = best_ids[i]
+                    taken.add(best_ids[i])
+            return user_ids, distances
+
+        per_user = self.user_distances(q)
+        distances[:] = per_user.min(axis=1)
+        face_idx, user_idx = np.nonzero(per_user < tolerance)
+        order = np.argsort(per_user[face_idx, user_idx])
+        taken_users = set()
+        for f, u in zip(face_idx[order], user_idx[order]):
+            if user_ids[f] is None and u not in taken_users:
+                user_ids[f] = self.user_ids[u]
+                distances[f] = per_user[f, u]
+                taken_users.add(u)
+        return user_ids, distances
@@ -0,0 +1,89 @@
+import os
+import threading
+import uuid
+from typing import Optional
+
+
+class GalleryCache:
+    """Process-level cache of the face gallery loaded into an engine.
+
+    The gallery is rebuilt from the database only when the generation marker
+    changes. The marker is a small file in the instance folder that holds a
+    random token, so every worker process sees a bump made by any other and
+    checking it costs one tiny file read per request instead of a query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._marker_path: Optional[str] = None
+        self._loaded_generation: Optional[str] = None
+        self._loaded_engines = set()
+        self._ann_options = {'enabled': False}
+
+    def init_app(self, app) -> None:
+        os.makedirs(app.instance_path, exist_ok=True)
+        self._marker_path = os.path.join(app.instance_path, app.config['GALLERY_GENERATION_FILE'])
+        self._ann_options = {
+            'enabled': app.config['FACE_ANN_ENABLED'],
+            'min_size': app.config['FACE_ANN_MIN_SIZE'],
+            'nlist': app.config['FACE_ANN_NLIST'],
+            'nprobe': app.config['FACE_ANN_NPROBE'],
+        }
+        if not os.path.exists(self._marker_path):
+            self.bump()
+
+    def current_generation(self) -> Optional[str]:
+        """Read the generation marker, or None if it is missing."""
+        try:
+            with open(self._marker_path) as f:
+                return f.read().strip()
+        except (OSError, TypeError):
+            return None
+
+    def bump(self) -> None:
+        """Mark the gallery as stale in every worker process.
+
+        Call after committing any change to face encodings or to the users
+        that own them.
+        """
+        if self._marker_path is None:
+            return
+        tmp_path = f"{self._marker_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, self._marker_path)
+
+    def ensure_loaded(self, engine) -> int:
+        """Load the gallery into ``engine`` if it is missing or stale.
+
+        Args:
+            engine: Face engine exposing ``gallery`` and ``load_face_encodings_from_db``
+
+        Returns:
+            int: Number of encodings in the engine's gallery
+        """
+        generation = self.current_generation()
+        if generation is not None and generation == self._loaded_generation \
+                and id(engine) in self._loaded_engines:
+            return len(engine.gallery)
+
+        with self._lock:
+            generation = self.current_generation()
+            if generation is None or generation != self._loaded_generation:
+                self._loaded_generation = generation
+                self._loaded_engines = set()
+            if id(engine) not in self._loaded_engines:
+                from app.models import db
+                from app.models.user import User
+                users_with_faces = User.query.options(db.undefer(User.face_encodings)).filter(
+                    User.face_encodings.isnot(None),
+                    User.is_active == True
+                ).all()
+                engine.gallery.configure_ann(**self._ann_options)
+                engine.load_face_encodings_from_db(users_with_faces)
+                self._loaded_engines.add(id(engine))
+        return len(engine.gallery)
+
+
+# Global instance
+gallery_cache = GalleryCache()
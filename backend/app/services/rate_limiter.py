@@ -0,0 +1,237 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+try:
+    import redis
+except ImportError:  # Optional: only needed with RATE_LIMIT_REDIS_URL
+    redis = None
+
+
+class Policy:
+    """A token bucket: ``capacity`` requests in a burst, refilled evenly over ``period`` seconds."""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period  # tokens per second
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional['Policy']:
+        """Parse '<requests>/<seconds>'; an empty spec or 0 requests means unlimited."""
+        if not spec or spec.strip() in ('0', 'off'):
+            return None
+        capacity, _, period = spec.partition('/')
+        capacity, period = int(capacity), float(period or 60)
+        if capacity <= 0:
+            return None
+        return cls(capacity, period)
+
+
+class _SQLiteBackend:
+    """Buckets in a SQLite file in the instance folder, shared by every
+    worker process on the host. One row per key; a take is a single
+    BEGIN IMMEDIATE transaction, so concurrent workers serialize on it."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            full_at REAL NOT NULL
+        )
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(self._SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_full_at ON rate_limit_buckets (full_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path, timeout=5)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key: str, policy: Policy, now: float) -> Tuple[bool, float]:
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?",
+                               (key,)).fetchone()
+            tokens = policy.capacity if row is None else \
+                min(policy.capacity, row[0] + max(0.0, now - row[1]) * policy.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            full_at = now + (policy.capacity - tokens) / policy.rate
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, "
+                "updated_at = excluded.updated_at, full_at = excluded.full_at",
+                (key, tokens, now, full_at)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, tokens
+
+    def evict(self, now: float) -> int:
+        # A bucket that has refilled completely is the same as no bucket
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM rate_limit_buckets WHERE full_at <= ?", (now,)).rowcount
+
+
+class _RedisBackend:
+    """Buckets in Redis (or anything speaking its protocol), shared across
+    hosts. The take runs as one Lua script and idle keys expire on their
+    own once their bucket would be full again."""
+
+    _TAKE = """
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+        local capacity = tonumber(ARGV[1])
+        local rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local tokens = capacity
+        if bucket[1] then
+            tokens = math.min(capacity, tonumber(bucket[1]) + math.max(0, now - tonumber(bucket[2])) * rate)
+        end
+        local allowed = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+            allowed = 1
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+        redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+        return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(self._TAKE)
+
+    def take(self, key: str, policy: Policy, now: float) -> Tuple[bool, float]:
+        allowed, tokens = self._take(keys=[f"rate_limit:{key}"], args=[policy.capacity, policy.rate, now])
+        return bool(allowed), float(tokens)
+
+    def evict(self, now: float) -> int:
+        return 0  # keys expire by themselves
+
+
+class RateLimiter:
+    """Token-bucket rate limiting shared by all worker processes.
+
+    Each (policy, key) pair has one bucket of constant size. Buckets live in
+    a SQLite file in the instance folder, or in Redis when
+    ``RATE_LIMIT_REDIS_URL`` is set and the redis package is installed. Each
+    process runs a background thread that deletes buckets that have been idle
+    long enough to be full again. If the backend fails, the request is let
+    through rather than rejected.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.policies: Dict[str, Optional[Policy]] = {}
+        self._backend = None
+        self._evict_interval = 60.0
+        self._evictor_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config['RATE_LIMIT_ENABLED']
+        self.policies = {name: Policy.parse(spec) for name, spec in app.config['RATE_LIMIT_POLICIES'].items()}
+        self._evict_interval = app.config['RATE_LIMIT_EVICT_INTERVAL']
+        if not self.enabled:
+            return
+        redis_url = app.config['RATE_LIMIT_REDIS_URL']
+        if redis_url and redis is not None:
+            self._backend = _RedisBackend(redis_url)
+            return
+        if redis_url:
+            print("RATE_LIMIT_REDIS_URL is set but the redis package is not installed; using SQLite")
+        os.makedirs(app.instance_path, exist_ok=True)
+        self._backend = _SQLiteBackend(os.path.join(app.instance_path, app.config['RATE_LIMIT_FILE']))
+
+    def hit(self, policy_name: str, key: str) -> Tuple[bool, int]:
+        """Take one token from the bucket of ``key`` under a policy.
+
+        Returns:
+            (allowed, retry_after): retry_after is the number of seconds until
+            a token is available again (0 when allowed)
+        """
+        policy = self.policies.get(policy_name)
+        if not self.enabled or policy is None:
+            return True, 0
+        self._ensure_evictor()
+        try:
+            allowed, tokens = self._backend.take(f"{policy_name}:{key}", policy, time.time())
+        except Exception as e:
+            print(f"Rate limiter unavailable, allowing request: {str(e)}")
+            return True, 0
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil((1 - tokens) / policy.rate))
+
+    def _ensure_evictor(self) -> None:
+        # Threads do not survive a fork, so each worker process starts its own
+        if self._evictor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._evictor_pid == os.getpid():
+                return
+            self._evictor_pid = os.getpid()
+            threading.Thread(target=self._evict_loop, name='rate-limit-evictor', daemon=True).start()
+
+    def _evict_loop(self) -> None:
+        while True:
+            time.sleep(self._evict_interval)
+            try:
+                self._backend.evict(time.time())
+            except Exception as e:
+                print(f"Error evicting idle rate limit buckets: {str(e)}")
+
+
+# Global instance
+rate_limiter = RateLimiter()
+
+
+def rate_limited(policy_name, key_by='user', error='Too many requests, please try again later'):
+    """Apply a rate limit policy to a view, answering 429 with Retry-After.
+
+    Args:
+        policy_name: Key of RATE_LIMIT_POLICIES
+        key_by: 'user' (JWT identity; goes below ``@jwt_required()``) or 'ip'
+            (client address; set TRUSTED_PROXY_COUNT behind a reverse proxy,
+            or every client shares the proxy's bucket)
+        error: Error message of the 429 response
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = str(get_jwt_identity()) if key_by == 'user' else request.remote_addr
+            allowed, retry_after = rate_limiter.hit(policy_name, key)
+            if not allowed:
+                response = jsonify({'error': error, 'code': 'RATE_LIMITED', 'retry_after': retry_after})
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
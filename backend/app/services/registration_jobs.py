@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class RegistrationJobs:
+    """Background batch face registration with locally stored job state.
+
+    Jobs run on a small thread pool in the process that accepted them and
+    encode their images through the encoding executor. State (status,
+    progress and per-image results) lives in a SQLite file in the instance
+    folder, so any worker process can answer a poll. A job whose owning
+    process died is reported as failed.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS registration_jobs (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            requested_by TEXT,
+            status TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            processed INTEGER NOT NULL DEFAULT 0,
+            succeeded INTEGER NOT NULL DEFAULT 0,
+            results TEXT NOT NULL DEFAULT '[]',
+            error TEXT,
+            pid INTEGER,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """
+
+    def __init__(self):
+        self._db_path: Optional[str] = None
+        self._app = None
+        self._workers = 2
+        self._ttl = 86400
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        os.makedirs(app.instance_path, exist_ok=True)
+        self._db_path = os.path.join(app.instance_path, app.config['REGISTRATION_JOBS_FILE'])
+        self._app = app
+        self._workers = app.config['FACE_REGISTER_JOB_WORKERS']
+        self._ttl = app.config['FACE_REGISTER_JOB_TTL']
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(self._SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork, so each worker process gets its own pool
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self._workers,
+                                                thread_name_prefix='registration-job')
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields['updated_at'] = time.time()
+        if 'results' in fields:
+            fields['results'] = json.dumps(fields['results'])
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE registration_jobs SET {assignments} WHERE id = ?",
+                         (*fields.values(), job_id))
+
+    def submit(self, user_id: str, images: List, requested_by: Optional[str] = None) -> str:
+        """Queue a batch registration and return its job id immediately.
+
+        Args:
+            user_id: User whose face encodings are replaced by the batch
+            images: Image bytes or base64 strings
+            requested_by: Id of the user who started the job
+
+        Returns:
+            str: Job id to poll with :meth:`get`
+        """
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM registration_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                         (DONE, FAILED, now - self._ttl))
+            conn.execute(
+                "INSERT INTO registration_jobs (id, user_id, requested_by, status, total, pid, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, str(user_id), requested_by, QUEUED, len(images), os.getpid(), now, now)
+            )
+        self._get_pool().submit(self._run, job_id, str(user_id), list(images))
+        print(f"Queued batch registration job {job_id}: {len(images)} images for user {user_id}")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Current state of a job, or None if it does not exist (or has expired)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM registration_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['status'] in (QUEUED, RUNNING) and not _process_alive(job['pid']):
+            job['status'] = FAILED
+            job['error'] = 'Worker process exited before the job finished'
+            self._update(job_id, status=FAILED, error=job['error'])
+        job['results'] = json.loads(job['results'])
+        job['progress'] = (job['processed'] / job['total']) * 100 if job['total'] else 100
+        job['created_at'] = datetime.utcfromtimestamp(job['created_at']).isoformat()
+        job['updated_at'] = datetime.utcfromtimestamp(job['updated_at']).isoformat()
+        del job['pid']
+        return job
+
+    def _run(self, job_id: str, user_id: str, images: List) -> None:
+        from app.services.encoding_executor import encoding_executor, EncodingQueueFull
+
+        try:
+            self._update(job_id, status=RUNNING)
+            results = []
+            encodings = []
+            # Chunks of one image per pool worker keep the pool's queue free for live requests
+            chunk_size = max(1, encoding_executor.workers)
+            for start in range(0, len(images), chunk_size):
+                chunk = images[start:start + chunk_size]
+                for attempt in range(30):
+                    try:
+                        chunk_encodings = encoding_executor.encode_many(chunk)
+                        break
+                    except EncodingQueueFull:
+                        time.sleep(0.5)
+                else:
+                    raise EncodingQueueFull("Encoding queue stayed full")
+                for offset, face_encoding in enumerate(chunk_encodings):
+                    found = face_encoding is not None
+                    results.append({'index': start + offset, 'status': 'ok' if found else 'no_face'})
+                    if found:
+                        encodings.append(face_encoding)
+                self._update(job_id, processed=len(results), succeeded=len(encodings), results=results)
+
+            if not encodings:
+                self._update(job_id, status=FAILED,
+                             error='Không thể trích xuất khuôn mặt từ bất kỳ ảnh nào')
+                return
+
+            self._save_encodings(user_id, encodings)
+            self._update(job_id, status=DONE)
+            print(f"Batch registration job {job_id} done: {len(encodings)}/{len(images)} images encoded")
+        except Exception as e:
+            print(f"Error in batch registration job {job_id}: {str(e)}")
+            traceback.print_exc()
+            self._update(job_id, status=FAILED, error=str(e))
+
+    def _save_encodings(self, user_id: str, encodings: List) -> None:
+        """Store the job's encodings in one commit, then invalidate the gallery."""
+        from app.models import db
+        from app.models.user import User
+        from app.services.encoding_codec import pack_encodings
+        from app.services.gallery_cache import gallery_cache
+
+        with self._app.app_context():
+            try:
+                user = User.query.get(user_id)
+                if user is None:
+                    raise ValueError('Người dùng không tồn tại')
+                user.face_encodings = pack_encodings(encodings)
+                user.face_registered = True
+                user.face_registered_at = datetime.utcnow()
+                user.updated_at = datetime.utcnow()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        gallery_cache.bump()
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    if pid == os.getpid() or os.name == 'nt':
+        # On Windows os.kill() sends a console event instead of probing
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Global instance
+registration_jobs = RegistrationJobs()
@@ -0,0 +1,76 @@
+"""Benchmark IVF approximate search against the exact gallery scan.
+
+Reports recall@1 (ANN best user == exact best user) and per-query latency
+for several nprobe settings on synthetic clustered descriptors.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_ann_index [--sizes 20000 100000 300000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.face_gallery import FaceGallery
+
+
+ENCODINGS_PER_USER = 5
+
+
+def make_data(n_descriptors, n_queries, dim=128, seed=0):
+    """Users as cluster centres with a few noisy descriptors each.
+
+    Spreads are chosen so same-person distances (~0.3) and different-person
+    distances (~1.2) resemble dlib ResNet descriptors.
+    """
+    rng = np.random.default_rng(seed)
+    n_users = max(1, n_descriptors // ENCODINGS_PER_USER)
+    centres = rng.normal(scale=0.08, size=(n_users, dim)).astype(np.float32)
+    noise = rng.normal(scale=0.02, size=(n_users, ENCODINGS_PER_USER, dim)).astype(np.float32)
+    entries = [(f'user-{u}', centres[u] + noise[u]) for u in range(n_users)]
+    picked = rng.integers(0, n_users, size=n_queries)
+    queries = centres[picked] + rng.normal(scale=0.02, size=(n_queries, dim)).astype(np.float32)
+    return entries, queries
+
+
+def per_query_ms(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 100000, 300000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        entries, queries = make_data(n, args.queries)
+        gallery = FaceGallery()
+        gallery.load(entries)
+        exact, exact_ms = per_query_ms(lambda q: gallery.best_match(q)[0], queries)
+
+        # The index is built by the next load
+        gallery.configure_ann(True, min_size=0)
+        start = time.perf_counter()
+        gallery.load(entries)
+        build_s = time.perf_counter() - start
+
+        print(f"\n{n} descriptors, nlist={len(gallery.index.centroids)}, build {build_s:.2f}s")
+        print(f"{'mode':>10} {'ms/query':>9} {'recall@1':>9} {'speedup':>8}")
+        print(f"{'exact':>10} {exact_ms:>9.3f} {1.0:>9.3f} {1.0:>7.1f}x")
+        for nprobe in args.nprobe:
+            gallery.index.nprobe = nprobe
+            approx, ann_ms = per_query_ms(lambda q: gallery.best_match(q)[0], queries)
+            recall = np.mean([a == e for a, e in zip(approx, exact)])
+            print(f"{'nprobe=' + str(nprobe):>10} {ann_ms:>9.3f} {recall:>9.3f} {exact_ms / ann_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Per-stage latency of the dlib pipeline: full-resolution vs downscaled detection.
+
+Needs dlib and the model files next to app/services/face_engine.py, plus a
+directory of sample kiosk frames (JPEG/PNG).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_detection path/to/frames [--width 480] [--upsample 1]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.face_engine import FaceEngine
+
+
+STAGES = ('decode', 'detect', 'landmarks', 'descriptor')
+
+
+def run_pipeline(engine, frames):
+    """Time each stage over all frames; returns mean ms per stage and faces found."""
+    totals = dict.fromkeys(STAGES, 0.0)
+    found = 0
+    for data in frames:
+        start = time.perf_counter()
+        rgb_img = engine._process_image(data)
+        totals['decode'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        dets = engine._detect_faces(rgb_img)
+        totals['detect'] += time.perf_counter() - start
+        if not dets:
+            continue
+        found += 1
+        det = max(dets, key=lambda det: (det.right() - det.left()) * (det.bottom() - det.top()))
+
+        start = time.perf_counter()
+        shape = engine.shape_predictor(rgb_img, det)
+        totals['landmarks'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        np.array(engine.face_encoder.compute_face_descriptor(rgb_img, shape))
+        totals['descriptor'] += time.perf_counter() - start
+
+    return {stage: totals[stage] / len(frames) * 1e3 for stage in STAGES}, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('frames_dir')
+    parser.add_argument('--width', type=int, default=480)
+    parser.add_argument('--upsample', type=int, default=1)
+    parser.add_argument('--crop-max-side', type=int, default=160)
+    args = parser.parse_args()
+
+    paths = sorted(p for ext in ('*.jpg', '*.jpeg', '*.png')
+                   for p in glob.glob(os.path.join(args.frames_dir, ext)))
+    if not paths:
+        sys.exit(f"No frames found in {args.frames_dir}")
+    frames = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            frames.append(f.read())
+
+    before = FaceEngine(detection_width=0, detection_upsample=1, crop_max_side=0)
+    after = FaceEngine(detection_width=args.width, detection_upsample=args.upsample,
+                       crop_max_side=args.crop_max_side)
+    before.load_models()
+    after.load_models()
+
+    # Warm up both pipelines once
+    run_pipeline(before, frames[:1])
+    run_pipeline(after, frames[:1])
+
+    before_ms, before_found = run_pipeline(before, frames)
+    after_ms, after_found = run_pipeline(after, frames)
+
+    print(f"{len(frames)} frames; faces found: before {before_found}, after {after_found}")
+    print(f"{'stage':>11} {'before ms':>10} {'after ms':>10}")
+    for stage in STAGES:
+        print(f"{stage:>11} {before_ms[stage]:>10.2f} {after_ms[stage]:>10.2f}")
+    print(f"{'total':>11} {sum(before_ms.values()):>10.2f} {sum(after_ms.values()):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Benchmark face encoding storage: JSON text vs packed float32 blobs.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_encoding_storage [--users 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.encoding_codec import pack_encodings, unpack_encodings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--per-user', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rows = [rng.normal(size=(args.per_user, 128)) * 0.1 for _ in range(args.users)]
+    json_rows = [json.dumps(r.tolist()) for r in rows]
+    packed_rows = [pack_encodings(r) for r in rows]
+
+    start = time.perf_counter()
+    for text in json_rows:
+        np.asarray(json.loads(text), dtype=np.float32)
+    json_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for blob in packed_rows:
+        unpack_encodings(blob)
+    packed_s = time.perf_counter() - start
+
+    json_size = sum(len(t) for t in json_rows) / args.users
+    packed_size = sum(len(b) for b in packed_rows) / args.users
+    print(f"{'format':>8} {'bytes/row':>10} {'load ms':>9}")
+    print(f"{'json':>8} {json_size:>10.0f} {json_s * 1e3:>9.1f}")
+    print(f"{'packed':>8} {packed_size:>10.0f} {packed_s * 1e3:>9.1f}")
+    print(f"size {json_size / packed_size:.1f}x smaller, load {json_s / packed_s:.0f}x faster "
+          f"({args.users} users x {args.per_user} encodings)")
+
+
+if __name__ == '__main__':
+    main()
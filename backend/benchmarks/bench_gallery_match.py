@@ -0,0 +1,80 @@
+"""Benchmark gallery matching: per-vector Python loop vs FaceGallery matrix.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_gallery_match [--sizes 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.face_gallery import FaceGallery
+
+
+ENCODINGS_PER_USER = 5
+
+
+def make_gallery(n_descriptors, dim=128, seed=0):
+    rng = np.random.default_rng(seed)
+    n_users = max(1, n_descriptors // ENCODINGS_PER_USER)
+    data = rng.normal(size=(n_users * ENCODINGS_PER_USER, dim)) * 0.1
+    per_user = {}
+    for u in range(n_users):
+        rows = data[u * ENCODINGS_PER_USER:(u + 1) * ENCODINGS_PER_USER]
+        per_user[f'user-{u}'] = [row.tolist() for row in rows]
+    return per_user, data
+
+
+def loop_match(known_face_encodings, query, tolerance=0.6):
+    """The previous FaceEngine.recognize_face inner loop."""
+    best_match_id = None
+    best_confidence = 0.0
+    for user_id, encodings in known_face_encodings.items():
+        distances = []
+        for enc in encodings:
+            if isinstance(enc, list):
+                enc = np.array(enc, dtype=np.float64)
+            distances.append(np.linalg.norm(query - enc))
+        if distances:
+            confidence = max(0.0, 1.0 - min(distances))
+            if confidence > best_confidence and confidence > (1.0 - tolerance):
+                best_confidence = confidence
+                best_match_id = user_id
+    return best_match_id
+
+
+def time_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'descriptors':>12} {'loop ms':>10} {'matrix ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        per_user, data = make_gallery(n)
+        gallery = FaceGallery()
+        gallery.load(per_user.items())
+
+        # Query close to a known user so both paths find a match
+        query = data[len(data) // 2] + 0.01
+        assert loop_match(per_user, query) == gallery.best_match(query)[0]
+
+        loop_repeat = max(1, args.repeat // max(1, n // 10000))
+        loop_s = time_call(lambda: loop_match(per_user, query), loop_repeat)
+        matrix_s = time_call(lambda: gallery.best_match(query), args.repeat)
+        print(f"{n:>12} {loop_s * 1e3:>10.2f} {matrix_s * 1e3:>10.3f} {loop_s / matrix_s:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -22,3 +22,72 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+
+    # Face engine serving the routes: 'simple' (no models, whole-frame encoding)
+    # or 'dlib' (HOG detection + ResNet descriptors; needed for multi_face)
+    FACE_ENGINE = os.environ.get('FACE_ENGINE', 'simple')
+
+    # Load models and gallery in create_app() (disable for CLI/migration runs)
+    FACE_WARMUP = os.environ.get('FACE_WARMUP', 'true').lower() == 'true'
+
+    # Face gallery cache (marker file lives in the instance folder)
+    GALLERY_GENERATION_FILE = 'gallery.generation'
+
+    # Approximate (IVF) search for large galleries; exact search below the minimum size
+    FACE_ANN_ENABLED = os.environ.get('FACE_ANN_ENABLED', 'false').lower() == 'true'
+    FACE_ANN_MIN_SIZE = int(os.environ.get('FACE_ANN_MIN_SIZE', 20000))
+    FACE_ANN_NLIST = int(os.environ.get('FACE_ANN_NLIST', 0))  # 0 = about 4 * sqrt(N)
+    FACE_ANN_NPROBE = int(os.environ.get('FACE_ANN_NPROBE', 8))  # higher = better recall, slower
+
+    # dlib face detection front stage
+    FACE_DETECTION_WIDTH = int(os.environ.get('FACE_DETECTION_WIDTH', 480))  # 0 = detect at full resolution
+    FACE_DETECTION_UPSAMPLE = int(os.environ.get('FACE_DETECTION_UPSAMPLE', 1))
+    FACE_CROP_MAX_SIDE = int(os.environ.get('FACE_CROP_MAX_SIDE', 160))  # 0 = always run detection
+
+    # Batched recognition
+    FACE_BATCH_MAX_FRAMES = int(os.environ.get('FACE_BATCH_MAX_FRAMES', 32))
+
+    # Encoding process pool, per server worker (0 = encode inline in the request thread).
+    # Opt-in for run.py; gunicorn.conf.py defaults it to the CPUs per gunicorn worker.
+    FACE_ENCODING_WORKERS = int(os.environ.get('FACE_ENCODING_WORKERS', 0))
+    FACE_ENCODING_QUEUE_SIZE = int(os.environ.get('FACE_ENCODING_QUEUE_SIZE', 16))  # pending jobs beyond the workers
+    FACE_ENCODING_TIMEOUT = float(os.environ.get('FACE_ENCODING_TIMEOUT', 10))  # seconds a request waits
+
+    # Background batch registration (job state lives in the instance folder)
+    REGISTRATION_JOBS_FILE = 'registration_jobs.sqlite'
+    FACE_REGISTER_JOB_WORKERS = int(os.environ.get('FACE_REGISTER_JOB_WORKERS', 2))  # concurrent jobs per server worker
+    FACE_REGISTER_JOB_TTL = int(os.environ.get('FACE_REGISTER_JOB_TTL', 86400))  # seconds finished jobs are kept
+
+    # Encodings of an enrollment in progress (staged in the database, shared by all workers)
+    FACE_ENROLLMENT_TTL = int(os.environ.get('FACE_ENROLLMENT_TTL', 3600))  # seconds a staged encoding is kept
+
+    # Write-behind attendance: respond once rows are in a local append log, insert in batches
+    ATTENDANCE_WRITE_BEHIND = os.environ.get('ATTENDANCE_WRITE_BEHIND', 'false').lower() == 'true'
+    ATTENDANCE_BUFFER_DIR = 'attendance_buffer'  # in the instance folder
+    ATTENDANCE_FLUSH_BATCH_SIZE = int(os.environ.get('ATTENDANCE_FLUSH_BATCH_SIZE', 500))  # rows per insert
+    ATTENDANCE_FLUSH_INTERVAL = float(os.environ.get('ATTENDANCE_FLUSH_INTERVAL', 1.0))  # max seconds rows wait
+
+    # Attendance history paging
+    HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 100))
+    HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', 1000))
+    HISTORY_STREAM_BATCH_SIZE = int(os.environ.get('HISTORY_STREAM_BATCH_SIZE', 500))  # rows fetched per round trip
+
+    # Authorization trusts the token's role claim; user role/active state is cached per worker for revocation
+    AUTH_STATE_TTL = float(os.environ.get('AUTH_STATE_TTL', 30))  # seconds a revoked token may keep working elsewhere
+    AUTH_STATE_CACHE_SIZE = int(os.environ.get('AUTH_STATE_CACHE_SIZE', 10000))
+
+    # Token-bucket rate limits shared by all workers ('<requests>/<seconds>', 0 = unlimited)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_POLICIES = {
+        'register': os.environ.get('RATE_LIMIT_REGISTER', '5/60'),  # per user
+        'recognize': os.environ.get('RATE_LIMIT_RECOGNIZE', '300/60'),  # per user (kiosk account)
+        'login': os.environ.get('RATE_LIMIT_LOGIN', '10/60'),  # per client IP
+    }
+    RATE_LIMIT_FILE = 'rate_limits.sqlite'  # in the instance folder
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL')  # share limits across hosts (needs redis)
+    RATE_LIMIT_EVICT_INTERVAL = float(os.environ.get('RATE_LIMIT_EVICT_INTERVAL', 60))  # seconds between idle sweeps
+
+    # Reverse proxies in front of the app (nginx, load balancer) whose X-Forwarded-For /
+    # X-Forwarded-Proto to trust; per-IP rate limits key on the client address they report.
+    # Keep 0 when clients connect directly, or anyone can spoof their address.
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
@@ -0,0 +1,34 @@
+# Gunicorn settings for wsgi.py (see its docstring)
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+# Workers by default: one per CPU, at most 4. Each worker holds its own
+# gallery and database pool and encodes in its own process pool, which
+# gets the CPUs the workers leave over (see FACE_ENCODING_WORKERS below),
+# so more workers add memory rather than encoding throughput.
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count(), 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# Each worker encodes in its own process pool (see encoding_executor); by
+# default the pools split the CPUs between the workers. This file runs
+# before the app is loaded, so Config picks the value up.
+os.environ.setdefault('FACE_ENCODING_WORKERS', str(max(1, (multiprocessing.cpu_count() or 1) // workers)))
+
+# Load the app (models, gallery) once in the master, then fork
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Database connections opened during warm-up belong to the master;
+    # drop them in the child without closing the master's sockets.
+    from wsgi import app
+    from app.models import db
+    from app.services.encoding_executor import encoding_executor
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    # Each worker owns its encoding pool; start it before the first request
+    encoding_executor.start()
@@ -0,0 +1,75 @@
+"""Pack face encodings as float32 blobs
+
+Revision ID: 3c9e51d2a7f4
+Revises: 0a2f2b7a196f
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+import json
+import struct
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e51d2a7f4'
+down_revision = '0a2f2b7a196f'
+branch_labels = None
+depends_on = None
+
+# Same layout as app/services/encoding_codec.py, kept inline so the
+# migration does not depend on application code.
+HEADER = struct.Struct('<4sBHI')
+MAGIC = b'FENC'
+VERSION = 1
+
+
+def _pack(encodings):
+    if not encodings:
+        return None
+    dim = len(encodings[0])
+    values = [float(v) for enc in encodings for v in enc]
+    return HEADER.pack(MAGIC, VERSION, dim, len(encodings)) + struct.pack(f'<{len(values)}f', *values)
+
+
+def _unpack(blob):
+    if not blob:
+        return None
+    _, _, dim, count = HEADER.unpack_from(blob)
+    values = struct.unpack_from(f'<{dim * count}f', blob, HEADER.size)
+    return [list(values[i * dim:(i + 1) * dim]) for i in range(count)]
+
+
+def _convert(source_type, target_type, convert):
+    users = sa.table(
+        'users',
+        sa.column('id', sa.String),
+        sa.column('face_encodings', source_type),
+        sa.column('face_encodings_new', target_type),
+    )
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('face_encodings_new', target_type, nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(users.c.id, users.c.face_encodings).where(users.c.face_encodings.isnot(None))
+    ).fetchall()
+    for user_id, value in rows:
+        bind.execute(
+            users.update().where(users.c.id == user_id).values(face_encodings_new=convert(value))
+        )
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('face_encodings')
+        batch_op.alter_column('face_encodings_new', new_column_name='face_encodings')
+
+
+def upgrade():
+    _convert(sa.Text(), sa.LargeBinary(), lambda text: _pack(json.loads(text)))
+
+
+def downgrade():
+    _convert(sa.LargeBinary(), sa.Text(),
+             lambda blob: json.dumps(_unpack(bytes(blob))) if blob else None)
@@ -0,0 +1,39 @@
+"""Unique attendance log per user and day
+
+Revision ID: 5d1f7c3b9e20
+Revises: 3c9e51d2a7f4
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1f7c3b9e20'
+down_revision = '3c9e51d2a7f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the earliest log of each (user_id, date) before enforcing uniqueness.
+    # Rows without created_at predate the column and count as the earliest;
+    # id breaks ties so exactly one row per group survives.
+    op.execute("""
+        DELETE FROM attendance_logs
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id, date
+                    ORDER BY CASE WHEN created_at IS NULL THEN 0 ELSE 1 END, created_at, id
+                ) AS rn
+                FROM attendance_logs
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+    op.create_index('uq_attendance_logs_user_date', 'attendance_logs', ['user_id', 'date'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_attendance_logs_user_date', table_name='attendance_logs')
@@ -0,0 +1,77 @@
+"""Add daily attendance summary tables
+
+Revision ID: 8b4e2f6a1c37
+Revises: 5d1f7c3b9e20
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e2f6a1c37'
+down_revision = '5d1f7c3b9e20'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so on an upgraded install the tables
+    # may already exist (empty or partly filled) by the time this runs
+    if not _has_table('daily_user_attendance'):
+        op.create_table(
+            'daily_user_attendance',
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('user_id', sa.String(length=36), nullable=False),
+            sa.Column('role', sa.String(length=20), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('date', 'user_id')
+        )
+    # Per-user windows (/stats per_user and user_id)
+    if not _has_index('daily_user_attendance', 'ix_daily_user_attendance_user_date'):
+        op.create_index('ix_daily_user_attendance_user_date', 'daily_user_attendance', ['user_id', 'date'])
+    if not _has_table('daily_role_attendance'):
+        op.create_table(
+            'daily_role_attendance',
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('role', sa.String(length=20), nullable=False),
+            sa.Column('present_count', sa.Integer(), nullable=False),
+            sa.Column('late_count', sa.Integer(), nullable=False),
+            sa.Column('absent_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('date', 'role')
+        )
+
+    # Backfill from existing logs (same as `flask attendance rebuild-summaries`),
+    # replacing whatever the app wrote into pre-created tables
+    op.execute("DELETE FROM daily_role_attendance")
+    op.execute("DELETE FROM daily_user_attendance")
+    op.execute("""
+        INSERT INTO daily_user_attendance (date, user_id, role, status)
+        SELECT attendance_logs.date, attendance_logs.user_id, users.role, attendance_logs.status
+        FROM attendance_logs JOIN users ON users.id = attendance_logs.user_id
+    """)
+    op.execute("""
+        INSERT INTO daily_role_attendance (date, role, present_count, late_count, absent_count)
+        SELECT date, role,
+               SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'late' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'absent' THEN 1 ELSE 0 END)
+        FROM daily_user_attendance
+        GROUP BY date, role
+    """)
+
+
+def downgrade():
+    op.drop_table('daily_role_attendance')
+    op.drop_index('ix_daily_user_attendance_user_date', table_name='daily_user_attendance')
+    op.drop_table('daily_user_attendance')
@@ -0,0 +1,36 @@
+"""Add composite and partial indexes for attendance and gallery lookups
+
+Revision ID: c6a9d3e5f812
+Revises: 8b4e2f6a1c37
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a9d3e5f812'
+down_revision = '8b4e2f6a1c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /today filters on date; /history and the export order by (date, time, id).
+    # (user_id, date) lookups already use uq_attendance_logs_user_date.
+    op.create_index('ix_attendance_logs_date_time_id', 'attendance_logs', ['date', 'time', 'id'])
+
+    # Gallery load: only active users with enrolled faces
+    op.create_index(
+        'ix_users_active_enrolled', 'users', ['id'],
+        postgresql_where=sa.text('face_encodings IS NOT NULL AND is_active = true'),
+        sqlite_where=sa.text('face_encodings IS NOT NULL AND is_active = 1')
+    )
+    op.create_index('ix_users_role_active', 'users', ['role', 'is_active'])
+
+
+def downgrade():
+    op.drop_index('ix_users_role_active', table_name='users')
+    op.drop_index('ix_users_active_enrolled', table_name='users')
+    op.drop_index('ix_attendance_logs_date_time_id', table_name='attendance_logs')
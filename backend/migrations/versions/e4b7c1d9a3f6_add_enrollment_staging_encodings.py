@@ -0,0 +1,50 @@
+"""Add enrollment staging table for in-progress face registration
+
+Revision ID: e4b7c1d9a3f6
+Revises: c6a9d3e5f812
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c1d9a3f6'
+down_revision = 'c6a9d3e5f812'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so the table and its indexes may
+    # already exist by the time this runs on an upgraded install
+    if not _has_table('enrollment_staging_encodings'):
+        op.create_table(
+            'enrollment_staging_encodings',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.String(length=36), nullable=False),
+            sa.Column('encoding', sa.LargeBinary(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_index('enrollment_staging_encodings', 'ix_enrollment_staging_user_created'):
+        op.create_index('ix_enrollment_staging_user_created', 'enrollment_staging_encodings',
+                        ['user_id', 'created_at'])
+    if not _has_index('enrollment_staging_encodings', 'ix_enrollment_staging_created'):
+        op.create_index('ix_enrollment_staging_created', 'enrollment_staging_encodings', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_enrollment_staging_created', table_name='enrollment_staging_encodings')
+    op.drop_index('ix_enrollment_staging_user_created', table_name='enrollment_staging_encodings')
+    op.drop_table('enrollment_staging_encodings')
@@ -1,6 +1,7 @@
 from app import create_app
 
-app = create_app()
-
+# Only when run as a script: the encoding pool's spawned children import
+# this module again as __mp_main__ and must not build an app of their own
 if __name__ == '__main__':
+    app = create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
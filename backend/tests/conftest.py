@@ -0,0 +1,81 @@
+import base64
+import os
+
+import cv2
+import numpy as np
+import pytest
+from flask import Flask
+
+from config import Config
+
+# Scratch PostgreSQL database for the PostgreSQL variants (skipped when unset)
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Build apps on a scratch database and instance folder.
+
+    Keyword arguments override Config attributes, e.g.
+    ``make_app(RATE_LIMIT_ENABLED=True)``.
+    """
+    from app.models import db
+    from app.services.attendance_recorder import attendance_recorder
+
+    apps = []
+    monkeypatch.setattr(Flask, 'auto_find_instance_path', lambda self: str(tmp_path / 'instance'))
+
+    def make(**overrides):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+            'FACE_ENGINE': 'simple',
+            'FACE_WARMUP': False,
+            'FACE_ENCODING_WORKERS': 0,
+            'RATE_LIMIT_ENABLED': False,
+            'ATTENDANCE_WRITE_BEHIND': False,
+        }
+        settings.update(overrides)
+        for name, value in settings.items():
+            monkeypatch.setattr(Config, name, value)
+
+        from app import create_app
+        app = create_app()
+        # The recorder's check-in cache is process-wide, not per app
+        attendance_recorder.invalidate()
+        apps.append(app)
+        return app
+
+    yield make
+
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def register_user(client, email, role='student', password='secret'):
+    """Create a user through /api/auth/register and return (user_id, auth headers)."""
+    response = client.post('/api/auth/register', json={
+        'email': email, 'password': password, 'name': email.split('@')[0], 'role': role
+    })
+    assert response.status_code == 201, response.json
+    token = client.post('/api/auth/login', json={'email': email, 'password': password}).json['access_token']
+    return response.json['user']['id'], {'Authorization': f'Bearer {token}'}
+
+
+def image_data_url(seed, size=120):
+    """A JPEG data URL of random pixels; the simple engine encodes anything of at least 100x100."""
+    pixels = (np.random.default_rng(seed).random((size, size)) * 255).astype(np.uint8)
+    ok, encoded = cv2.imencode('.jpg', pixels)
+    assert ok
+    return 'data:image/jpeg;base64,' + base64.b64encode(encoded.tobytes()).decode()
@@ -0,0 +1,106 @@
+from datetime import date, datetime, time, timedelta
+
+from tests.conftest import register_user
+
+
+def test_second_check_in_of_the_day_is_ignored(app, client):
+    from app.models import db
+    from app.models.attendance import AttendanceLog
+    from app.models.attendance_summary import DailyRoleAttendance
+    from app.services.attendance_recorder import attendance_recorder
+
+    student_id, student = register_user(client, 'student@example.com')
+
+    first = client.post('/api/attendance/log', json={'user_id': student_id}, headers=student)
+    assert first.status_code == 201
+    second = client.post('/api/attendance/log', json={'user_id': student_id, 'status': 'late'}, headers=student)
+    assert second.status_code == 400
+
+    with app.app_context():
+        # A writer that missed the cache (another worker) hits the unique index instead
+        attendance_recorder.invalidate()
+        results = attendance_recorder.record({student_id: ('late', 0.8)}, buffered=False)
+        assert results[student_id] == (first.json['attendance']['id'], False)
+
+        logs = db.session.query(AttendanceLog.status).filter(AttendanceLog.user_id == student_id).all()
+        assert [status for status, in logs] == ['present']
+        summary = db.session.get(DailyRoleAttendance, (date.today(), 'student'))
+        assert (summary.present_count, summary.late_count) == (1, 0)
+
+
+def test_record_inserts_each_user_once_per_day(app, client):
+    from app.models import db
+    from app.models.attendance import AttendanceLog
+    from app.services.attendance_recorder import attendance_recorder
+
+    user_ids = [register_user(client, f's{i}@example.com')[0] for i in range(3)]
+    day = date.today() - timedelta(days=1)
+
+    with app.app_context():
+        results = attendance_recorder.record({user_id: ('present', 0.9) for user_id in user_ids[:2]},
+                                             day=day, buffered=False)
+        assert all(inserted for _, inserted in results.values())
+        attendance_recorder.invalidate()
+        results = attendance_recorder.record({user_id: ('late', 0.9) for user_id in user_ids},
+                                             day=day, buffered=False)
+        assert {user_id: inserted for user_id, (_, inserted) in results.items()} == {
+            user_ids[0]: False, user_ids[1]: False, user_ids[2]: True
+        }
+        assert db.session.query(AttendanceLog).filter(AttendanceLog.date == day).count() == 3
+
+
+def _seed_history(app, user_ids, days=3):
+    """One log per user and day, at a distinct time per user."""
+    from app.services.attendance_recorder import attendance_recorder
+
+    with app.app_context():
+        for days_ago in range(days):
+            day = date.today() - timedelta(days=days_ago)
+            for i, user_id in enumerate(user_ids):
+                attendance_recorder.record({user_id: ('present', 0.9)}, day=day,
+                                           now=datetime.combine(day, time(8, i)), buffered=False)
+
+
+def _walk_history(client, headers, query=''):
+    pages, cursor = [], None
+    while True:
+        url = f'/api/attendance/history?limit=2{query}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.json
+        pages.append(response.json['attendance'])
+        cursor = response.json['next_cursor']
+        assert response.json['has_more'] == (cursor is not None)
+        if cursor is None:
+            return pages
+
+
+def test_history_keyset_pages_cover_every_row_once(app, client):
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+    user_ids = [register_user(client, f's{i}@example.com')[0] for i in range(3)]
+    _seed_history(app, user_ids)
+
+    pages = _walk_history(client, admin)
+    rows = [row for page in pages for row in page]
+    assert [len(page) for page in pages] == [2, 2, 2, 2, 1]
+    assert len({row['id'] for row in rows}) == 9
+    # Newest first on (date, time, id)
+    keys = [(row['date'], row['time'], row['id']) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_history_pages_keep_filters(app, client):
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+    user_ids = [register_user(client, f's{i}@example.com')[0] for i in range(3)]
+    _seed_history(app, user_ids)
+    since = (date.today() - timedelta(days=1)).isoformat()
+
+    pages = _walk_history(client, admin, f'&user_id={user_ids[1]}&start_date={since}')
+    rows = [row for page in pages for row in page]
+    assert [row['user_id'] for row in rows] == [user_ids[1]] * 2
+    assert [row['date'] for row in rows] == [date.today().isoformat(), since]
+
+
+def test_history_rejects_a_bad_cursor(client):
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+
+    assert client.get('/api/attendance/history?cursor=not-a-cursor', headers=admin).status_code == 400
@@ -0,0 +1,221 @@
+"""Migrations and the plans of the hot queries.
+
+The schema under test is built the way deployments build it: the tables
+of the baseline release, stamped at its revision, then ``flask db upgrade``.
+The plans checked are those of the SQL the app actually issues while
+serving check-ins, history, stats, gallery loads and enrollment. SQLite
+always runs; PostgreSQL runs when TEST_POSTGRES_URL points at a scratch
+database (its tables are dropped afterwards).
+"""
+from datetime import date, time, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import event
+
+from app.cli import _full_scans, _plan_queries, _sql_full_scans
+from tests.conftest import POSTGRES_URL, register_user
+
+MIGRATIONS = str(Path(__file__).resolve().parents[1] / 'migrations')
+
+# Schema of the baseline release (revision 0a2f2b7a196f), created by db.create_all()
+BASELINE_REVISION = '0a2f2b7a196f'
+baseline = sa.MetaData()
+sa.Table(
+    'users', baseline,
+    sa.Column('id', sa.String(36), primary_key=True),
+    sa.Column('email', sa.String(120), unique=True, nullable=False),
+    sa.Column('password_hash', sa.String(255), nullable=False),
+    sa.Column('name', sa.String(100), nullable=False),
+    sa.Column('role', sa.String(20), nullable=False),
+    sa.Column('face_image', sa.LargeBinary),
+    sa.Column('face_encodings', sa.Text),
+    sa.Column('face_registered_at', sa.DateTime),
+    sa.Column('is_active', sa.Boolean),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('updated_at', sa.DateTime),
+)
+sa.Table(
+    'attendance_logs', baseline,
+    sa.Column('id', sa.String(36), primary_key=True),
+    sa.Column('user_id', sa.String(36), sa.ForeignKey('users.id'), nullable=False),
+    sa.Column('date', sa.Date, nullable=False),
+    sa.Column('time', sa.Time, nullable=False),
+    sa.Column('status', sa.String(20), nullable=False),
+    sa.Column('confidence', sa.Float),
+    sa.Column('image_path', sa.String(255)),
+    sa.Column('created_at', sa.DateTime),
+)
+
+DATABASES = [
+    'sqlite',
+    pytest.param('postgresql', marks=pytest.mark.skipif(not POSTGRES_URL, reason='TEST_POSTGRES_URL is not set')),
+]
+
+
+@pytest.fixture(params=DATABASES)
+def database_url(request, tmp_path):
+    if request.param == 'sqlite':
+        yield f"sqlite:///{tmp_path / 'plans.db'}"
+        return
+    yield POSTGRES_URL
+    engine = sa.create_engine(POSTGRES_URL)
+    metadata = sa.MetaData()
+    metadata.reflect(engine)
+    metadata.drop_all(engine)
+    engine.dispose()
+
+
+def _create_baseline(url, rows=()):
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        baseline.create_all(conn)
+        for table, values in rows:
+            conn.execute(baseline.tables[table].insert(), values)
+    engine.dispose()
+
+
+def _upgrade(app):
+    from flask_migrate import stamp, upgrade
+    with app.app_context():
+        stamp(directory=MIGRATIONS, revision=BASELINE_REVISION)
+        upgrade(directory=MIGRATIONS)
+
+
+def _migrated_app(make_app, monkeypatch, url, **overrides):
+    """App on a schema built only by the migrations (create_all switched off)."""
+    from app.models import db
+
+    _create_baseline(url)
+    monkeypatch.setattr(db, 'create_all', lambda *args, **kwargs: None)
+    app = make_app(SQLALCHEMY_DATABASE_URI=url, **overrides)
+    _upgrade(app)
+    return app
+
+
+def _indexes(engine):
+    inspector = sa.inspect(engine)
+    return {
+        table: sorted((index['name'], tuple(index['column_names']), bool(index['unique']))
+                      for index in inspector.get_indexes(table))
+        for table in inspector.get_table_names() if table != 'alembic_version'
+    }
+
+
+def test_upgrade_after_create_all(make_app, database_url):
+    """An existing install: create_app() has run create_all() before `flask db upgrade`."""
+    users = [{'id': 'u1', 'email': 'a@example.com', 'password_hash': 'x', 'name': 'A',
+              'role': 'student', 'face_encodings': '[[0.5, 0.25]]', 'is_active': True}]
+    logs = [
+        {'id': 'l1', 'user_id': 'u1', 'date': date(2026, 1, 5), 'time': time(8), 'status': 'present'},
+        {'id': 'l2', 'user_id': 'u1', 'date': date(2026, 1, 5), 'time': time(9), 'status': 'late'},
+        {'id': 'l3', 'user_id': 'u1', 'date': date(2026, 1, 6), 'time': time(9), 'status': 'late'},
+    ]
+    _create_baseline(database_url, [('users', users), ('attendance_logs', logs)])
+    app = make_app(SQLALCHEMY_DATABASE_URI=database_url)
+    _upgrade(app)
+
+    from app.models import db
+    with app.app_context():
+        assert db.session.execute(sa.text("SELECT version_num FROM alembic_version")).scalar() == 'e4b7c1d9a3f6'
+        # Duplicates without created_at are removed, the summaries are backfilled
+        assert db.session.execute(sa.text("SELECT COUNT(*) FROM attendance_logs")).scalar() == 2
+        summary = db.session.execute(sa.text(
+            "SELECT role, present_count, late_count FROM daily_role_attendance ORDER BY date"
+        )).all()
+        assert [tuple(row) for row in summary] == [('student', 1, 0), ('student', 0, 1)]
+
+
+def test_migrations_match_models(make_app, monkeypatch, tmp_path):
+    """Every index the models declare is created by a migration."""
+    from app.models import db
+
+    app = _migrated_app(make_app, monkeypatch, f"sqlite:///{tmp_path / 'migrated.db'}")
+    with app.app_context():
+        migrated = _indexes(db.engine)
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    db.metadata.create_all(engine)
+    declared = _indexes(engine)
+    engine.dispose()
+
+    assert migrated == declared
+
+
+@pytest.fixture
+def migrated_app(make_app, monkeypatch, database_url):
+    return _migrated_app(make_app, monkeypatch, database_url, HISTORY_PAGE_SIZE=1)
+
+
+def _capture(app):
+    """Record the SQL the app sends to the database (statement, parameters)."""
+    from app.models import db
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE')):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    return engine, statements, lambda: event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_served_queries_use_an_index(migrated_app):
+    from app.models import db
+    from app.services.attendance_recorder import attendance_recorder
+    from app.services.enrollment_staging import enrollment_staging
+    from app.services.face_engines import face_engines
+    from app.services.gallery_cache import gallery_cache
+
+    client = migrated_app.test_client()
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+    student_id, student = register_user(client, 'student@example.com')
+    with migrated_app.app_context():
+        for days_ago in (1, 2):
+            attendance_recorder.record({student_id: ('present', 0.9)},
+                                       day=date.today() - timedelta(days=days_ago), buffered=False)
+
+    engine, statements, stop = _capture(migrated_app)
+    try:
+        assert client.post('/api/attendance/log', json={'user_id': student_id}, headers=student).status_code == 201
+        assert client.get('/api/attendance/today', headers=admin).status_code == 200
+        page = client.get('/api/attendance/history', headers=admin).json
+        assert client.get(f"/api/attendance/history?cursor={page['next_cursor']}", headers=admin).status_code == 200
+        assert client.get(f'/api/attendance/stats?user_id={student_id}', headers=admin).status_code == 200
+        assert client.get('/api/attendance/stats?daily=true', headers=admin).status_code == 200
+        with migrated_app.app_context():
+            gallery_cache.bump()
+            gallery_cache.ensure_loaded(face_engines.get())
+            enrollment_staging.append(student_id, np.zeros(128, dtype=np.float32))
+    finally:
+        stop()
+
+    assert statements
+    failures = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            with conn.begin() as transaction:
+                plan, scans = _sql_full_scans(conn, statement, parameters)
+                transaction.rollback()
+            if scans:
+                failures.append(f"full scan of {', '.join(scans)}:\n{statement}\n{plan}")
+    assert not failures, '\n\n'.join(failures)
+
+
+def test_cli_plan_queries_use_an_index(migrated_app):
+    from app.models import db
+
+    failures = {}
+    with migrated_app.app_context(), db.engine.connect() as conn:
+        for name, statement in _plan_queries().items():
+            with conn.begin() as transaction:
+                plan, scans = _full_scans(conn, statement)
+                transaction.rollback()
+            if scans:
+                failures[name] = f"full scan of {', '.join(scans)}\n{plan}"
+
+    assert not failures, '\n\n'.join(f"{name}: {detail}" for name, detail in failures.items())
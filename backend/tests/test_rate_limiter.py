@@ -0,0 +1,65 @@
+import pytest
+
+from tests.conftest import register_user
+
+
+@pytest.fixture
+def limited_app(make_app):
+    def make(**overrides):
+        return make_app(RATE_LIMIT_ENABLED=True, RATE_LIMIT_REDIS_URL=None, RATE_LIMIT_POLICIES={
+            'login': '3/60', 'register': '2/60', 'recognize': '0'
+        }, **overrides)
+    return make
+
+
+def _bad_login(client, **kwargs):
+    return client.post('/api/auth/login', json={'email': 'nobody@example.com', 'password': 'wrong'}, **kwargs)
+
+
+def test_login_is_limited_per_client_address(limited_app):
+    client = limited_app().test_client()
+
+    assert [_bad_login(client).status_code for _ in range(3)] == [401, 401, 401]
+    response = _bad_login(client)
+    assert response.status_code == 429
+    assert response.json['code'] == 'RATE_LIMITED'
+    assert 1 <= int(response.headers['Retry-After']) <= 20
+    assert response.json['retry_after'] == int(response.headers['Retry-After'])
+
+    # Another client address has its own bucket
+    assert _bad_login(client, environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 401
+
+
+def test_forwarded_address_is_ignored_without_trusted_proxies(limited_app):
+    client = limited_app().test_client()
+
+    codes = [_bad_login(client, headers={'X-Forwarded-For': f'10.0.0.{i}'}).status_code for i in range(4)]
+    assert codes == [401, 401, 401, 429]
+
+
+def test_trusted_proxy_keys_on_forwarded_client(limited_app):
+    client = limited_app(TRUSTED_PROXY_COUNT=1).test_client()
+    proxy = {'REMOTE_ADDR': '172.16.0.1'}
+
+    codes = [_bad_login(client, headers={'X-Forwarded-For': f'10.0.0.{i}'}, environ_base=proxy).status_code
+             for i in range(6)]
+    assert codes == [401] * 6
+    codes = [_bad_login(client, headers={'X-Forwarded-For': '10.0.0.9'}, environ_base=proxy).status_code
+             for _ in range(4)]
+    assert codes == [401, 401, 401, 429]
+
+
+def test_face_register_is_limited_per_user(limited_app):
+    client = limited_app().test_client()
+    _, first = register_user(client, 'first@example.com')
+    _, second = register_user(client, 'second@example.com', password='other')
+
+    codes = [client.post('/api/face/register', json={}, headers=first).status_code for _ in range(3)]
+    assert codes == [400, 400, 429]
+    assert client.post('/api/face/register', json={}, headers=second).status_code == 400
+
+
+def test_disabled_limits_let_everything_through(make_app):
+    client = make_app(RATE_LIMIT_ENABLED=False).test_client()
+
+    assert {_bad_login(client).status_code for _ in range(15)} == {401}
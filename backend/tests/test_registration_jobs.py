@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from tests.conftest import image_data_url, register_user
+
+
+def _wait_for_job(client, status_url, headers, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.get(status_url, headers=headers)
+        assert response.status_code == 200, response.json
+        if response.json['status'] in ('done', 'failed'):
+            return response.json
+        time.sleep(0.05)
+    pytest.fail(f"job at {status_url} did not finish")
+
+
+def test_batch_registration_job_completes(client):
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+    student_id, _ = register_user(client, 'student@example.com')
+
+    response = client.post('/api/face/register/batch', headers=admin, json={
+        'user_id': student_id,
+        'images': [image_data_url(seed) for seed in range(3)] + [image_data_url(99, size=20)]
+    })
+    assert response.status_code == 202
+    assert response.json['status'] == 'queued'
+    assert response.json['total_images'] == 4
+
+    job = _wait_for_job(client, response.json['status_url'], admin)
+    assert job['status'] == 'done'
+    assert job['error'] is None
+    assert (job['processed'], job['succeeded'], job['progress']) == (4, 3, 100)
+    assert [result['status'] for result in job['results']] == ['ok', 'ok', 'ok', 'no_face']
+
+    status = client.get(f'/api/face/register-status/{student_id}', headers=admin).json
+    assert status['saved_encodings_count'] == 3
+
+
+def test_batch_registration_job_fails_without_faces(client):
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+    student_id, _ = register_user(client, 'student@example.com')
+
+    response = client.post('/api/face/register/batch', headers=admin, json={
+        'user_id': student_id,
+        'images': [image_data_url(seed, size=20) for seed in range(2)] + ['data:image/jpeg;base64,not-an-image']
+    })
+    assert response.status_code == 202
+
+    job = _wait_for_job(client, response.json['status_url'], admin)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Không thể trích xuất khuôn mặt từ bất kỳ ảnh nào'
+    assert job['succeeded'] == 0
+    assert client.get(f'/api/face/register-status/{student_id}', headers=admin).json['saved_encodings_count'] == 0
+
+
+def test_batch_registration_job_access(client):
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+    student_id, student = register_user(client, 'student@example.com')
+    _, other = register_user(client, 'other@example.com')
+
+    status_url = client.post('/api/face/register/batch', headers=admin, json={
+        'user_id': student_id, 'images': [image_data_url(1)]
+    }).json['status_url']
+    _wait_for_job(client, status_url, admin)
+
+    # The registered user may watch their own job, other students may not
+    assert client.get(status_url, headers=student).status_code == 200
+    assert client.get(status_url, headers=other).status_code == 403
+    assert client.get('/api/face/register/batch/no-such-job', headers=admin).status_code == 404
+
+
+def test_batch_registration_requires_images(client):
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+    student_id, _ = register_user(client, 'student@example.com')
+
+    assert client.post('/api/face/register/batch', headers=admin,
+                       json={'user_id': student_id, 'images': []}).status_code == 400
+    assert client.post('/api/face/register/batch', headers=admin,
+                       json={'user_id': 'missing', 'images': [image_data_url(1)]}).status_code == 404
@@ -0,0 +1,32 @@
+from tests.conftest import image_data_url, register_user
+
+
+def test_delete_user_removes_staged_enrollment(app, client):
+    from app.models import db
+    from app.models.enrollment_staging import EnrollmentStagingEncoding
+    from app.models.user import User
+
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+    student_id, student = register_user(client, 'student@example.com')
+    other_id, other = register_user(client, 'other@example.com')
+    for user_id, headers in ((student_id, student), (other_id, other)):
+        response = client.post('/api/face/register', headers=headers,
+                               json={'user_id': user_id, 'image_data': image_data_url(1)})
+        assert response.status_code == 200, response.json
+        assert response.json['temp_encodings_count'] == 1
+
+    assert client.delete(f'/api/users/{student_id}', headers=admin).status_code == 200
+
+    with app.app_context():
+        assert db.session.get(User, student_id) is None
+        staged = db.session.query(EnrollmentStagingEncoding.user_id).all()
+        assert [user_id for user_id, in staged] == [other_id]
+
+
+def test_deleted_user_token_is_rejected(client):
+    _, admin = register_user(client, 'admin@example.com', role='admin')
+    student_id, student = register_user(client, 'student@example.com')
+
+    assert client.get('/api/auth/me', headers=student).status_code == 200
+    assert client.delete(f'/api/users/{student_id}', headers=admin).status_code == 200
+    assert client.get('/api/auth/me', headers=student).status_code == 401
@@ -0,0 +1,20 @@
+"""Pre-fork WSGI entry point for production serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app enabled (see gunicorn.conf.py), this module is imported
+once in the gunicorn master. create_app() warms up the face models and
+loads the gallery there, before any worker is forked, so every worker
+starts with them already in memory and shares those pages copy-on-write
+with the master. run.py remains the single-process development server.
+"""
+import gc
+
+from app import create_app
+
+app = create_app()
+
+# Move everything allocated so far into the permanent generation. The
+# cyclic garbage collector then never writes to those objects' headers in
+# the workers, which would otherwise copy the shared pages one by one.
+gc.freeze()
@@ -9,6 +9,9 @@ import {
   FiUserPlus 
 } from 'react-icons/fi';
 
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_TIMEOUT_MS = 5 * 60 * 1000;
+
 const Attendance = () => {
   const { user } = useAuth();
   const [recognitionResult, setRecognitionResult] = useState(null);
@@ -116,19 +119,45 @@ const Attendance = () => {
     }
   };
 
+  // Batch registration runs as a background job; poll it until it finishes
+  const waitForRegistrationJob = async (jobId) => {
+    const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+      const { data: job } = await faceAPI.batchRegisterJob(jobId);
+      if (job.status === 'done' || job.status === 'failed') {
+        return job;
+      }
+      setRecognitionResult({
+        success: true,
+        message: `Đang xử lý ảnh... ${job.processed}/${job.total}`
+      });
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+    throw new Error('Quá thời gian chờ xử lý đăng ký');
+  };
+
   const handleFinalRegistration = async (images) => {
     try {
       setLoading(true);
       
-      // Send all images to backend for final registration
+      // Send all images to backend for final registration (answered with 202 and a job)
       const response = await faceAPI.batchRegister({
         user_id: selectedUser,
         images: images.map(img => img.src)
       });
 
+      const job = await waitForRegistrationJob(response.data.job_id);
+      if (job.status === 'failed') {
+        setRecognitionResult({
+          success: false,
+          message: job.error || 'Có lỗi xảy ra khi đăng ký. Vui lòng thử lại.'
+        });
+        return;
+      }
+
       setRecognitionResult({
         success: true,
-        message: `Đăng ký thành công với ${images.length} ảnh!`,
+        message: `Đăng ký thành công với ${job.succeeded}/${job.total} ảnh!`,
         registration_complete: true
       });
 
@@ -141,7 +170,7 @@ const Attendance = () => {
       console.error('Error in final registration:', error);
       setRecognitionResult({
         success: false,
-        message: error.response?.data?.error || 'Có lỗi xảy ra khi đăng ký. Vui lòng thử lại.'
+        message: error.message || 'Có lỗi xảy ra khi đăng ký. Vui lòng thử lại.'
       });
     } finally {
       setLoading(false);
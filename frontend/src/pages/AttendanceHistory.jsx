@@ -10,6 +10,8 @@ const AttendanceHistory = () => {
   const [startDate, setStartDate] = useState('');
   const [endDate, setEndDate] = useState('');
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [exporting, setExporting] = useState(false);
 
   useEffect(() => {
     if (user.role === 'admin' || user.role === 'teacher') {
@@ -27,16 +29,15 @@ const AttendanceHistory = () => {
     }
   };
 
-  const fetchAttendance = async () => {
+  const fetchAttendance = async (cursor = null) => {
     setLoading(true);
     try {
-      const params = {};
-      if (selectedUser) params.user_id = selectedUser;
-      if (startDate) params.start_date = startDate;
-      if (endDate) params.end_date = endDate;
+      const params = filterParams();
+      if (cursor) params.cursor = cursor;
 
       const response = await attendanceAPI.history(params);
-      setAttendance(response.data.attendance);
+      setAttendance(cursor ? [...attendance, ...response.data.attendance] : response.data.attendance);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching attendance history:', error);
     } finally {
@@ -49,30 +50,68 @@ const AttendanceHistory = () => {
     fetchAttendance();
   };
 
-  const exportToCSV = () => {
-    const headers = ['Tên', 'Ngày', 'Thời gian', 'Trạng thái', 'Độ tin cậy'];
-    const csvData = attendance.map(record => [
-      record.user_name,
-      record.date,
-      record.time,
-      record.status === 'present' ? 'Có mặt' : 'Vắng',
-      record.confidence ? `${(record.confidence * 100).toFixed(1)}%` : 'N/A'
-    ]);
-
-    const csvContent = [
-      headers.join(','),
-      ...csvData.map(row => row.join(','))
-    ].join('\n');
-
-    const blob = new Blob([csvContent], { type: 'text/csv' });
+  const filterParams = () => {
+    const params = {};
+    if (selectedUser) params.user_id = selectedUser;
+    if (startDate) params.start_date = startDate;
+    if (endDate) params.end_date = endDate;
+    return params;
+  };
+
+  const downloadBlob = (blob, filename) => {
     const url = URL.createObjectURL(blob);
     const link = document.createElement('a');
     link.href = url;
-    link.download = `attendance_history_${new Date().toISOString().split('T')[0]}.csv`;
+    link.download = filename;
     link.click();
     URL.revokeObjectURL(url);
   };
 
+  const exportToCSV = async () => {
+    const filename = `attendance_history_${new Date().toISOString().split('T')[0]}.csv`;
+    setExporting(true);
+    try {
+      if (user.role === 'admin' || user.role === 'teacher') {
+        // Streamed by the server with the current filters, not just the loaded pages
+        const response = await attendanceAPI.export({ ...filterParams(), format: 'csv' });
+        downloadBlob(response.data, filename);
+        return;
+      }
+
+      // Students cannot use /export; walk every /history page of their own records
+      const records = [];
+      let cursor = null;
+      do {
+        const params = filterParams();
+        if (cursor) params.cursor = cursor;
+        const response = await attendanceAPI.history(params);
+        records.push(...response.data.attendance);
+        cursor = response.data.next_cursor;
+      } while (cursor);
+
+      const headers = ['Tên', 'Ngày', 'Thời gian', 'Trạng thái', 'Độ tin cậy'];
+      const csvData = records.map(record => [
+        record.user_name,
+        record.date,
+        record.time,
+        record.status === 'present' ? 'Có mặt' : 'Vắng',
+        record.confidence ? `${(record.confidence * 100).toFixed(1)}%` : 'N/A'
+      ]);
+
+      const csvContent = [
+        headers.join(','),
+        ...csvData.map(row => row.join(','))
+      ].join('\n');
+
+      downloadBlob(new Blob([csvContent], { type: 'text/csv' }), filename);
+    } catch (error) {
+      console.error('Error exporting attendance:', error);
+      alert('Xuất CSV thất bại: ' + error.message);
+    } finally {
+      setExporting(false);
+    }
+  };
+
   return (
     <div className="container">
       <h1>Lịch sử điểm danh</h1>
@@ -126,8 +165,8 @@ const AttendanceHistory = () => {
             </div>
 
             <div className="form-group">
-              <button type="button" onClick={exportToCSV} className="btn btn-success">
-                Xuất CSV
+              <button type="button" onClick={exportToCSV} className="btn btn-success" disabled={exporting}>
+                {exporting ? 'Đang xuất...' : 'Xuất CSV'}
               </button>
             </div>
           </div>
@@ -172,6 +211,11 @@ const AttendanceHistory = () => {
                   ))}
                 </tbody>
               </table>
+              {nextCursor && (
+                <button type="button" onClick={() => fetchAttendance(nextCursor)} className="btn btn-primary">
+                  Tải thêm
+                </button>
+              )}
             </div>
           )}
         </div>
@@ -60,6 +60,7 @@ export const authAPI = {
 export const faceAPI = {
   register: (data) => api.post('/face/register', data),
   batchRegister: (data) => api.post('/face/register/batch', data),
+  batchRegisterJob: (jobId) => api.get(`/face/register/batch/${jobId}`),
   recognize: (data) => api.post('/face/recognize', data),
   getRegistrationStatus: (userId) => api.get(`/face/register/status/${userId}`),
 };
@@ -69,6 +70,7 @@ export const attendanceAPI = {
   history: (params) => api.get('/attendance/history', { params }),
   today: () => api.get('/attendance/today'),
   stats: (params) => api.get('/attendance/stats', { params }),
+  export: (params) => api.get('/attendance/export', { params, responseType: 'blob' }),
 };
 
 export const usersAPI = {